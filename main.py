@@ -1,34 +1,74 @@
+import time
+BOOT_STARTED = time.perf_counter()
+
 import discord
 from discord.ext import commands
 from discord import app_commands, Interaction, ButtonStyle
 from discord.ui import Button, View, Select, Modal, TextInput
 import io
 import os
+import re
+import json
+import math
+import pickle
+import struct
+import hashlib
+import tempfile
 import asyncio
-import aiohttp 
+import aiohttp
+import random
+import logging
+import sys
+import threading
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 from dotenv import load_dotenv
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Literal
 
 # --- IMPORTAÇÕES DA DISCLOUD ---
 import discloud
 from discloud.errors import RequestError
-from discloud.discloud import Action, Application, ApplicationInfo, AppMod
+from discloud.discloud import Action, Application, AppMod
 
 # --- CONFIGURAÇÃO ---
 load_dotenv()
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 DISCLOUD_TOKEN = os.getenv("DISCLOUD_TOKEN")
-
-if not DISCORD_TOKEN or not DISCLOUD_TOKEN:
-    print("❌ ERRO: Tokens não definidos no .env")
-    exit()
-
-discloud_client = discloud.Client(DISCLOUD_TOKEN)
-
-intents = discord.Intents.default()
+# Várias contas: "nome:token,nome2:token2" (DISCLOUD_TOKEN vira a conta "principal")
+DISCLOUD_ACCOUNTS = os.getenv("DISCLOUD_ACCOUNTS", "")
+# Quem vê cada conta: "guild:ID=conta1|conta2;role:ID=conta1" (vazio = todos veem tudo)
+ACCOUNT_ACCESS = os.getenv("ACCOUNT_ACCESS", "")
+ACCOUNT_MAX_CONCURRENCY = int(os.getenv("ACCOUNT_MAX_CONCURRENCY", "4"))
+# Sharding: vazio = uma conexão só; "auto" = quantidade recomendada pelo Discord; ou um número fixo
+SHARD_COUNT = os.getenv("SHARD_COUNT", "").strip().lower()
+SHARD_PROCESSES = int(os.getenv("SHARD_PROCESSES", "1"))
+# Definidos pelo lançador para cada processo filho (podem ser fixados à mão)
+SHARD_IDS = [int(s) for s in os.getenv("SHARD_IDS", "").split(",") if s.strip()]
+SHARD_WORKER = int(os.getenv("SHARD_WORKER", "0"))
+COORDINATOR_SOCKET = os.getenv("COORDINATOR_SOCKET", "")
+
+# Só os intents que o painel usa: menos eventos processados e menos cache no container
+intents = discord.Intents.none()
+intents.guilds = True
+intents.guild_messages = True
 intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+bot_options = dict(
+    command_prefix="!",
+    intents=intents,
+    max_messages=None,
+    chunk_guilds_at_startup=False,
+    member_cache_flags=discord.MemberCacheFlags.none()
+)
+if SHARD_COUNT:
+    bot = commands.AutoShardedBot(
+        shard_count=None if SHARD_COUNT == "auto" else int(SHARD_COUNT),
+        shard_ids=SHARD_IDS or None,
+        **bot_options
+    )
+else:
+    bot = commands.Bot(**bot_options)
 
 # --- CORES E EMOJIS ---
 C_GREEN = 0x50F862
@@ -67,12 +107,21 @@ VALID_PERMISSIONS = [
 ]
 
 # --- HELPER: BARRA DE PROGRESSO & PARSER ---
+SIZE_UNITS = (("TB", 1024 * 1024), ("GB", 1024), ("MB", 1), ("KB", 1 / 1024), ("B", 1 / 1024 / 1024))
+
 def parse_to_mb(value_str: str) -> float:
     try:
-        clean = value_str.upper().strip()
-        if "GB" in clean:
-            return float(clean.replace("GB", "")) * 1024
-        return float(clean.replace("MB", ""))
+        clean = str(value_str).upper().replace(",", ".").strip()
+        for unit, factor in SIZE_UNITS:
+            if clean.endswith(unit):
+                return float(clean[:-len(unit)].strip()) * factor
+        return float(clean)
+    except Exception:
+        return 0.0
+
+def parse_percent(value_str: str) -> float:
+    try:
+        return float(str(value_str).replace(",", ".").replace("%", "").strip())
     except Exception:
         return 0.0
 
@@ -83,24 +132,1874 @@ def create_emoji_bar(current_str: str, total_str: str, length=10) -> str:
     filled = int(length * percent)
     return "🟩" * filled + "⬛" * (length - filled)
 
+# --- RESILIÊNCIA: CIRCUIT BREAKER + RETRIES COM JITTER ---
+DISCLOUD_TIMEOUT = float(os.getenv("DISCLOUD_TIMEOUT", "10"))
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+TRANSIENT_MARKERS = ("500", "502", "503", "504", "ratelimit", "rate limit", "timeout", "timed out")
+
+class CircuitOpenError(Exception):
+    def __init__(self, group: str, retry_in: float):
+        super().__init__(f"A API da Discloud está instável ({group}). Nova tentativa em {retry_in:.0f}s.")
+        self.group = group
+        self.retry_in = retry_in
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, aiohttp.ClientError)):
+        return True
+    message = str(error).lower()
+    return isinstance(error, RequestError) and any(marker in message for marker in TRANSIENT_MARKERS)
+
+class CircuitBreaker:
+    def __init__(self, group: str):
+        self.group = group
+        self.state = "closed"  # closed -> open -> half_open -> closed
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def retry_in(self) -> float:
+        return max(0.0, BREAKER_RESET_SECONDS - (time.monotonic() - self.opened_at))
+
+    def before_call(self) -> bool:
+        # True quando esta chamada é a de teste (quem liberou a vaga é quem a devolve)
+        if self.state == "open":
+            if self.retry_in() > 0:
+                raise CircuitOpenError(self.group, self.retry_in())
+            self.state = "half_open"
+        if self.state == "half_open":
+            # Só uma chamada de teste passa enquanto o circuito está meio aberto
+            if self._probing:
+                raise CircuitOpenError(self.group, BREAKER_RESET_SECONDS)
+            self._probing = True
+            return True
+        return False
+
+    def abort_probe(self):
+        # Chamada cancelada não diz nada sobre a API: libera a vaga de teste para a próxima
+        self._probing = False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.failures >= BREAKER_THRESHOLD:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def describe(self) -> str:
+        if self.state == "open":
+            return f"🔴 `{self.group}` aberto (tenta de novo em {self.retry_in():.0f}s)"
+        if self.state == "half_open":
+            return f"🟡 `{self.group}` em teste"
+        return f"🟢 `{self.group}` normal"
+
+# --- PERFIL DE INTERAÇÕES (OPCIONAL) ---
+PROFILE_INTERACTIONS = os.getenv("PROFILE_INTERACTIONS", "0").lower() in ("1", "true", "sim")
+PROFILE_THRESHOLD_MS = int(os.getenv("PROFILE_THRESHOLD_MS", "1500"))
+PROFILE_FILE = os.getenv("PROFILE_FILE", os.path.join("profiles", "interactions.log"))
+PROFILE_MAX_BYTES = int(os.getenv("PROFILE_MAX_BYTES", str(1024 * 1024)))
+PROFILE_BACKUPS = int(os.getenv("PROFILE_BACKUPS", "3"))
+PROFILE_SAMPLE_INTERVAL = 0.01
+PROFILE_PHASE_LABELS = {"api": "API Discloud", "discord": "Discord", "render": "Render/código"}
+
+class InteractionTrace:
+    def __init__(self, label: str, user: str):
+        self.label = label
+        self.user = user
+        self.ts = time.time()
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.intervals: Dict[str, List[tuple]] = {}  # fase -> [(início, fim)]
+        self.breakdown: Dict[str, float] = {}
+        self.samples: Dict[str, int] = {}  # pilha "a;b;c" -> amostras
+        self.profiled = False
+
+def merged_duration(intervals: List[tuple]) -> float:
+    # Chamadas em paralelo (gather) contam o tempo de parede uma vez só
+    total, end = 0.0, None
+    for begin, finish in sorted(intervals):
+        if end is None or begin > end:
+            total += finish - begin
+            end = finish
+        elif finish > end:
+            total += finish - end
+            end = finish
+    return total
+
+def frame_label(frame) -> str:
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}:{frame.f_lineno}"
+
+def running_stack(frame, task: asyncio.Task) -> str:
+    # Pilha da thread do loop, se ela está executando a coroutine da interação agora (tempo de CPU)
+    coro_frame = getattr(task.get_coro(), "cr_frame", None)
+    frames = []
+    while frame is not None and coro_frame is not None:
+        frames.append(frame_label(frame))
+        if frame is coro_frame:
+            return ";".join(reversed(frames))
+        frame = frame.f_back
+    return ""
+
+def await_chain(task: asyncio.Task) -> str:
+    # Segue o cr_await da coroutine da interação: mostra onde ela está esperando agora
+    frames = []
+    coro = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame_label(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return ";".join(frames)
+
+current_trace: ContextVar[Optional[InteractionTrace]] = ContextVar("current_trace", default=None)
+
+class InteractionProfiler:
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.recent: deque = deque(maxlen=100)
+        self._logger: Optional[logging.Logger] = None
+        self.active: Dict[asyncio.Task, InteractionTrace] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop_thread: Optional[int] = None
+
+    def start(self, label: str, user: str):
+        if not self.enabled or current_trace.get() is not None:
+            return
+        trace = InteractionTrace(label, user)
+        current_trace.set(trace)
+        task = asyncio.current_task()
+        with self._lock:
+            self.active[task] = trace
+        # Amostra de outra thread: uma task no mesmo loop só rodaria nos awaits e nunca veria o render
+        self._loop_thread = threading.get_ident()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._sample, name="interaction-profiler", daemon=True)
+            self._thread.start()
+        self._wake.set()
+        # A interação termina quando a task do callback termina
+        task.add_done_callback(lambda _: self.finish(trace, task))
+
+    @contextmanager
+    def phase(self, name: str):
+        trace = current_trace.get()
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            if trace is not None:
+                trace.intervals.setdefault(name, []).append((begin, time.perf_counter()))
+
+    def _sample(self):
+        while True:
+            self._wake.wait()
+            time.sleep(PROFILE_SAMPLE_INTERVAL)
+            frame = sys._current_frames().get(self._loop_thread)
+            with self._lock:
+                if not self.active:
+                    self._wake.clear()
+                    continue
+                for task, trace in self.active.items():
+                    # Rodando: pilha real da thread do loop; parada num await: a cadeia de awaits
+                    stack = running_stack(frame, task) or await_chain(task)
+                    if stack:
+                        trace.samples[stack] = trace.samples.get(stack, 0) + 1
+            del frame
+
+    def finish(self, trace: InteractionTrace, task: asyncio.Task):
+        with self._lock:
+            self.active.pop(task, None)
+        trace.total = time.perf_counter() - trace.started
+        api = merged_duration(trace.intervals.get("api", []))
+        discord_time = merged_duration(trace.intervals.get("discord", []))
+        trace.breakdown = {"api": api, "discord": discord_time, "render": max(0.0, trace.total - api - discord_time)}
+        if trace.total * 1000 >= PROFILE_THRESHOLD_MS:
+            try:
+                self.write_profile(trace)
+                trace.profiled = True
+            except Exception as e:
+                print(f"Erro ao gravar perfil da interação: {e}")
+        self.recent.append(trace)
+
+    @property
+    def logger(self) -> logging.Logger:
+        if self._logger is None:
+            from logging.handlers import RotatingFileHandler  # só com o perfil ligado e uma interação lenta
+            folder = os.path.dirname(PROFILE_FILE)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            logger = logging.getLogger("discloud_manager.profiles")
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            logger.addHandler(RotatingFileHandler(PROFILE_FILE, maxBytes=PROFILE_MAX_BYTES, backupCount=PROFILE_BACKUPS, encoding="utf-8"))
+            self._logger = logger
+        return self._logger
+
+    def write_profile(self, trace: InteractionTrace):
+        # Cabeçalho JSON + pilhas no formato "folded" (abre direto em flamegraph.pl/speedscope)
+        header = {
+            "ts": datetime.fromtimestamp(trace.ts).isoformat(timespec="seconds"), "label": trace.label, "user": trace.user,
+            "total_ms": round(trace.total * 1000), **{f"{k}_ms": round(v * 1000) for k, v in trace.breakdown.items()},
+        }
+        lines = [f"# {json.dumps(header, ensure_ascii=False)}"]
+        lines += [f"{stack} {count}" for stack, count in sorted(trace.samples.items(), key=lambda item: -item[1])]
+        self.logger.info("\n".join(lines) + "\n")
+
+    def slowest(self, limit: int = 10) -> List[InteractionTrace]:
+        return sorted(self.recent, key=lambda trace: trace.total, reverse=True)[:limit]
+
+profiler = InteractionProfiler(PROFILE_INTERACTIONS)
+
+# --- COORDENAÇÃO ENTRE PROCESSOS (SHARDS) ---
+COORDINATOR_CACHE_TTL = 60
+
+async def read_frame(reader: asyncio.StreamReader):
+    size = struct.unpack(">I", await reader.readexactly(4))[0]
+    return pickle.loads(await reader.readexactly(size))
+
+def write_frame(writer: asyncio.StreamWriter, message):
+    data = pickle.dumps(message)
+    writer.write(struct.pack(">I", len(data)) + data)
+
+class ShardCoordinator:
+    # Roda no processo lançador: orçamento por conta, cache de respostas e métricas de todos os shards
+    def __init__(self, path: str):
+        self.path = path
+        self.budgets: Dict[str, asyncio.Semaphore] = {}
+        self.cache: Dict[tuple, tuple] = {}  # (endpoint, chave) -> (timestamp, resultado serializado)
+        self.metrics: Dict[int, tuple] = {}  # worker -> (horário, métricas dos shards)
+        self._server = None
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._server = await asyncio.start_unix_server(self.handle, path=self.path)
+        os.chmod(self.path, 0o600)  # só o mesmo usuário conversa com o coordenador
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            message = await read_frame(reader)
+            op = message[0]
+            if op == "acquire":
+                budget = self.budgets.setdefault(message[1], asyncio.Semaphore(ACCOUNT_MAX_CONCURRENCY))
+                async with budget:
+                    write_frame(writer, True)
+                    await writer.drain()
+                    # A vaga é devolvida quando o worker fecha a conexão (inclusive se ele cair)
+                    await reader.read()
+            elif op == "get":
+                entry = self.cache.get(message[1])
+                fresh = entry and time.monotonic() - entry[0] < message[2]
+                write_frame(writer, entry[1] if fresh else None)
+            elif op == "put":
+                now = time.monotonic()
+                ttl = message[3] if len(message) > 3 else COORDINATOR_CACHE_TTL
+                self.cache[message[1]] = (now, message[2], ttl)
+                for k in [k for k, entry in self.cache.items() if now - entry[0] > entry[2]]:
+                    del self.cache[k]
+            elif op == "invalidate":
+                for k in [k for k in self.cache if k[1] == message[1]]:
+                    del self.cache[k]
+            elif op == "metrics":
+                self.metrics[message[1]] = (time.time(), message[2])
+            elif op == "stats":
+                write_frame(writer, self.metrics)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            print(f"Erro no coordenador de shards: {e}")
+        finally:
+            writer.close()
+
+class CoordinatorClient:
+    # Nos workers: sem COORDINATOR_SOCKET tudo fica local ao processo
+    def __init__(self, path: str):
+        self.path = path
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    async def request(self, message, reply: bool = True):
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        try:
+            write_frame(writer, message)
+            await writer.drain()
+            return await read_frame(reader) if reply else None
+        finally:
+            writer.close()
+
+    def send(self, message):
+        async def deliver():
+            try:
+                await self.request(message, reply=False)
+            except Exception as e:
+                print(f"Erro ao falar com o coordenador: {e}")
+        if self.enabled:
+            asyncio.ensure_future(deliver())
+
+    @asynccontextmanager
+    async def slot(self, account: "DiscloudAccount"):
+        if not self.enabled:
+            async with account.budget:
+                yield
+            return
+        try:
+            reader, writer = await asyncio.open_unix_connection(self.path)
+            write_frame(writer, ("acquire", account.name))
+            await writer.drain()
+            await read_frame(reader)
+        except Exception as e:
+            print(f"Erro ao reservar orçamento no coordenador: {e}")
+            async with account.budget:
+                yield
+            return
+        try:
+            yield
+        finally:
+            writer.close()
+
+    async def get(self, k: tuple, max_age: float):
+        if not self.enabled:
+            return None
+        try:
+            data = await self.request(("get", k, max_age))
+            return pickle.loads(data) if data is not None else None
+        except Exception as e:
+            print(f"Erro ao ler cache compartilhado: {e}")
+            return None
+
+    def put(self, k: tuple, result, ttl: float = COORDINATOR_CACHE_TTL):
+        if not self.enabled:
+            return
+        try:
+            data = pickle.dumps(result)
+        except Exception:
+            return  # objeto não serializável: fica só no cache local
+        self.send(("put", k, data, ttl))
+
+coordinator = CoordinatorClient(COORDINATOR_SOCKET)
+
+# --- CONTAS DISCLOUD (UM CLIENTE POR TOKEN) ---
+class DiscloudAccount:
+    def __init__(self, name: str, token: str):
+        self.name = name
+        self.token = token
+        self._client: Optional[discloud.Client] = None
+        # Orçamento de requisições simultâneas da conta (rate limit é por token)
+        self.budget = asyncio.Semaphore(ACCOUNT_MAX_CONCURRENCY)
+        self.breakers: Dict[str, CircuitBreaker] = {}  # grupo de endpoints -> breaker
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def client(self) -> discloud.Client:
+        if self._client is None:
+            self._client = discloud.Client(self.token)
+        return self._client
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=ACCOUNT_MAX_CONCURRENCY),
+                headers={"api-token": self.token}
+            )
+        return self._session
+
+    def breaker(self, group: str) -> CircuitBreaker:
+        if group not in self.breakers:
+            self.breakers[group] = CircuitBreaker(group)
+        return self.breakers[group]
+
+    def degraded_breakers(self) -> List[CircuitBreaker]:
+        return [b for b in self.breakers.values() if b.state != "closed"]
+
+    async def call(self, factory, group: str = "actions", idempotent: bool = False):
+        # Leituras idempotentes ganham timeout curto e retries; ações nunca são repetidas
+        breaker = self.breaker(group)
+        attempts = RETRY_ATTEMPTS if idempotent else 1
+        for attempt in range(attempts):
+            probe = breaker.before_call()
+            try:
+                async with coordinator.slot(self):
+                    with profiler.phase("api"):
+                        if idempotent:
+                            result = await asyncio.wait_for(factory(), DISCLOUD_TIMEOUT)
+                        else:
+                            result = await factory()
+            except asyncio.CancelledError:
+                if probe:
+                    breaker.abort_probe()
+                raise
+            except Exception as e:
+                if not is_transient(e):
+                    breaker.record_success()  # a API respondeu; o erro é do pedido
+                    raise
+                breaker.record_failure()
+                if attempt + 1 >= attempts or breaker.state == "open":
+                    raise
+                # Backoff exponencial com "full jitter" para não sincronizar os retries
+                await asyncio.sleep(random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt))
+            else:
+                breaker.record_success()
+                return result
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+_download_session: Optional[aiohttp.ClientSession] = None
+
+def download_session() -> aiohttp.ClientSession:
+    # Sessão sem o api-token para baixar arquivos de links externos (backups, logs)
+    global _download_session
+    if _download_session is None or _download_session.closed:
+        _download_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None, sock_read=60))
+    return _download_session
+
+def parse_accounts() -> Dict[str, DiscloudAccount]:
+    accounts: Dict[str, DiscloudAccount] = {}
+    if DISCLOUD_TOKEN:
+        accounts["principal"] = DiscloudAccount("principal", DISCLOUD_TOKEN)
+    for entry in DISCLOUD_ACCOUNTS.split(","):
+        name, sep, token = entry.strip().partition(":")
+        if sep and name.strip() and token.strip():
+            accounts[name.strip()] = DiscloudAccount(name.strip(), token.strip())
+    return accounts
+
+def parse_access_rules() -> List[tuple]:
+    rules = []
+    for entry in ACCOUNT_ACCESS.split(";"):
+        target, sep, names = entry.strip().partition("=")
+        kind, _, target_id = target.partition(":")
+        if sep and kind in ("guild", "role") and target_id.strip().isdigit():
+            rules.append((kind, int(target_id), {n.strip() for n in names.split("|") if n.strip()}))
+    return rules
+
+# Preenchidos por load_accounts() em main(); os clientes só são criados no primeiro uso
+ACCOUNTS: Dict[str, DiscloudAccount] = {}
+ACCESS_RULES: List[tuple] = []
+APP_ACCOUNTS: Dict[str, str] = {}  # app_id -> nome da conta dona da app
+
+def load_accounts():
+    ACCOUNTS.clear()
+    ACCOUNTS.update(parse_accounts())
+    ACCESS_RULES[:] = parse_access_rules()
+
+def default_account() -> DiscloudAccount:
+    return next(iter(ACCOUNTS.values()))
+
+def account_for_app(app_id: str) -> DiscloudAccount:
+    return ACCOUNTS.get(APP_ACCOUNTS.get(str(app_id))) or default_account()
+
+async def close_sessions():
+    for account in ACCOUNTS.values():
+        await account.close()
+    if _download_session and not _download_session.closed:
+        await _download_session.close()
+
+def accounts_for(interaction: Interaction) -> List[DiscloudAccount]:
+    if not ACCESS_RULES:
+        return list(ACCOUNTS.values())
+    role_ids = {r.id for r in getattr(interaction.user, "roles", [])}
+    allowed = set()
+    for kind, target_id, names in ACCESS_RULES:
+        if (kind == "guild" and target_id == interaction.guild_id) or (kind == "role" and target_id in role_ids):
+            allowed.update(names)
+    if "*" in allowed:
+        return list(ACCOUNTS.values())
+    return [acc for name, acc in ACCOUNTS.items() if name in allowed]
+
 # --- FUNÇÃO HELPER PARA API DE PERFIL ---
 async def update_app_profile(app_id: str, name: str, avatar_url: str):
+    account = account_for_app(app_id)
     url = f"https://api.discloud.app/v2/app/{app_id}/profile"
-    headers = {
-        "api-token": DISCLOUD_TOKEN,
-        "Content-Type": "application/json"
-    }
     payload = {
         "name": name,
         "avatarURL": avatar_url
     }
-    async with aiohttp.ClientSession() as session:
-        async with session.put(url, headers=headers, json=payload) as response:
+    async def put():
+        async with account.session.put(url, json=payload) as response:
             data = await response.json()
             if response.status == 200:
                 return True, data.get("message", "Perfil atualizado.")
             else:
                 return False, data.get("message", "Erro desconhecido na API.")
+    return await account.call(put)
+
+# --- CACHE DE MODERADORES (COMPARTILHADO ENTRE PAINÉIS) ---
+MODS_CACHE_TTL = int(os.getenv("MODS_CACHE_TTL", "60"))
+
+class ModsCache:
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._entries: Dict[str, tuple] = {}  # app_id -> (timestamp, mods)
+        self._managers: Dict[str, discloud.ModManager] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def manager(self, app_id: str) -> discloud.ModManager:
+        mgr = self._managers.get(app_id)
+        if mgr is None:
+            mgr = self._managers[app_id] = discloud.ModManager(account_for_app(app_id).client, app_id)
+        return mgr
+
+    def peek(self, app_id: str) -> Optional[List[AppMod]]:
+        entry = self._entries.get(app_id)
+        if entry and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+        return None
+
+    async def get(self, app_id: str, force: bool = False) -> List[AppMod]:
+        if not force:
+            cached = self.peek(app_id)
+            if cached is not None:
+                return cached
+
+        # Um lock por app: vários painéis abertos na mesma app fazem uma única busca
+        lock = self._locks.setdefault(app_id, asyncio.Lock())
+        async with lock:
+            if not force:
+                cached = self.peek(app_id)
+                if cached is not None:
+                    return cached
+            mods = await account_for_app(app_id).call(self.manager(app_id).get_mods, "mods", idempotent=True)
+            mods = mods if isinstance(mods, list) else [mods] if mods else []
+            self._write(app_id, mods)
+            return mods
+
+    def _write(self, app_id: str, mods: List[AppMod]):
+        self._entries[app_id] = (time.monotonic(), mods)
+
+    def _upsert(self, app_id: str, mod_id: str, perms: List[str]):
+        # Write-through: aplica o resultado da API no cache em vez de buscar a lista de novo
+        cached = self.peek(app_id)
+        if cached is None:
+            return
+        updated = AppMod({"modID": mod_id, "perms": list(perms)})
+        mods = [updated if str(m.id) == str(mod_id) else m for m in cached]
+        if not any(str(m.id) == str(mod_id) for m in cached):
+            mods.append(updated)
+        self._write(app_id, mods)
+
+    async def add(self, app_id: str, mod_id: str, perms: List[str]):
+        mgr = self.manager(app_id)
+        result = await op_queue.submit(app_id, "mod_add", lambda: account_for_app(app_id).call(lambda: mgr.add_mod(mod_id=mod_id, perms=perms), "mods"), key=(str(mod_id), tuple(perms)))
+        self._upsert(app_id, mod_id, perms)
+        return result
+
+    async def edit(self, app_id: str, mod_id: str, perms: List[str]):
+        mgr = self.manager(app_id)
+        result = await op_queue.submit(app_id, "mod_edit", lambda: account_for_app(app_id).call(lambda: mgr.edit_mod_perms(mod_id=mod_id, new_perms=perms), "mods"), key=(str(mod_id), tuple(perms)))
+        self._upsert(app_id, mod_id, perms)
+        return result
+
+    async def delete(self, app_id: str, mod_id: str):
+        mgr = self.manager(app_id)
+        result = await op_queue.submit(app_id, "mod_delete", lambda: account_for_app(app_id).call(lambda: mgr.delete_mod(mod_id), "mods"), key=str(mod_id))
+        cached = self.peek(app_id)
+        if cached is not None:
+            self._write(app_id, [m for m in cached if str(m.id) != str(mod_id)])
+        return result
+
+    def invalidate(self, app_id: str):
+        self._entries.pop(app_id, None)
+        self._managers.pop(app_id, None)
+        self._locks.pop(app_id, None)
+
+mods_cache = ModsCache(MODS_CACHE_TTL)
+
+# --- SNAPSHOTS COMPACTOS DAS APPS (TABELA COMPARTILHADA) ---
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+class AppSnapshot:
+    # Só os campos que o painel usa; imutável para poder ser compartilhado entre painéis
+    __slots__ = ("id", "name", "lang", "online", "type", "mainFile", "autoRestart", "autoDeployGit", "ramKilled", "avatarURL")
+
+    def __init__(self, **fields):
+        for slot in self.__slots__:
+            object.__setattr__(self, slot, fields.get(slot))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("AppSnapshot é imutável; use APP_TABLE.update()")
+
+    @classmethod
+    def from_info(cls, info) -> "AppSnapshot":
+        return cls(
+            id=_intern(str(info.id)),
+            name=info.name,
+            lang=_intern(getattr(info, "lang", None)),
+            online=bool(getattr(info, "online", False)),
+            type=_intern(getattr(info, "type", None)),
+            mainFile=_intern(getattr(info, "mainFile", None)),
+            autoRestart=bool(getattr(info, "autoRestart", False)),
+            autoDeployGit=_intern(getattr(info, "autoDeployGit", None)),
+            ramKilled=bool(getattr(info, "ramKilled", False)),
+            avatarURL=getattr(info, "avatarURL", None),
+        )
+
+    def fields(self) -> tuple:
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __reduce__(self):
+        # Permite enviar snapshots pelo coordenador de shards apesar do __setattr__ bloqueado
+        return (AppSnapshot._restore, (self.fields(),))
+
+    @classmethod
+    def _restore(cls, values: tuple) -> "AppSnapshot":
+        return cls(**dict(zip(cls.__slots__, values)))
+
+    def replace(self, **changes) -> "AppSnapshot":
+        fields = dict(zip(self.__slots__, self.fields()))
+        fields.update(changes)
+        return AppSnapshot(**fields)
+
+class AppTable:
+    def __init__(self):
+        self._apps: Dict[str, AppSnapshot] = {}
+
+    def ingest(self, infos) -> List[AppSnapshot]:
+        snapshots = []
+        for info in infos:
+            snap = AppSnapshot.from_info(info)
+            current = self._apps.get(snap.id)
+            # App sem mudanças mantém o mesmo objeto: nada é realocado a cada refresh
+            if current is None or current.fields() != snap.fields():
+                self._apps[snap.id] = current = snap
+            snapshots.append(current)
+        return snapshots
+
+    def get(self, app_id: str) -> Optional[AppSnapshot]:
+        return self._apps.get(str(app_id))
+
+    def update(self, app_id: str, **changes):
+        current = self._apps.get(str(app_id))
+        if current is not None:
+            self._apps[current.id] = current.replace(**changes)
+
+    def remove(self, app_id: str):
+        self._apps.pop(str(app_id), None)
+
+    def __len__(self):
+        return len(self._apps)
+
+APP_TABLE = AppTable()
+_snapshot_cost: Optional[float] = None
+
+def snapshot_memory_per_1000() -> float:
+    # Mede (uma vez) quantos KB ocupam 1.000 snapshots sintéticos, incluindo os nomes
+    global _snapshot_cost
+    if _snapshot_cost is None:
+        import tracemalloc
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        sample = [
+            AppSnapshot(id=_intern(str(1764807332795 + n)), name=f"App {n}", lang=_intern("python"), online=True,
+                        type=0, mainFile=_intern("main.py"), autoRestart=True, autoDeployGit=_intern("no"),
+                        ramKilled=False, avatarURL=f"https://i.imgur.com/{n:07d}.png")
+            for n in range(1000)
+        ]
+        _snapshot_cost = (tracemalloc.get_traced_memory()[0] - before) / 1024
+        del sample
+        if not was_tracing:
+            tracemalloc.stop()
+    return _snapshot_cost
+
+# --- COALESCÊNCIA DE REQUISIÇÕES (REFRESH) ---
+MIN_REFRESH_INTERVAL = float(os.getenv("MIN_REFRESH_INTERVAL", "3"))
+
+class RequestCoalescer:
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._recent: Dict[tuple, tuple] = {}  # (endpoint, chave) -> (timestamp, resultado, horário)
+        self._stale: Dict[tuple, float] = {}  # chaves servidas do cache com a API instável -> horário do dado
+
+    async def run(self, endpoint: str, key: str, factory, fresh: bool = False, allow_stale: bool = False, adopt=None):
+        k = (endpoint, key)
+        if not fresh:
+            recent = self._recent.get(k)
+            if recent and time.monotonic() - recent[0] < self.min_interval:
+                return recent[1]
+
+        # Todos os painéis que pedem o mesmo dado ao mesmo tempo aguardam a mesma chamada
+        task = self._inflight.get(k)
+        if task is None:
+            task = asyncio.ensure_future(self._load(k, factory, fresh, adopt))
+            self._inflight[k] = task
+            task.add_done_callback(lambda t: self._finish(k, t))
+        try:
+            return await asyncio.shield(task)
+        except Exception as e:
+            # Com o circuito aberto (ou a API falhando) o painel mostra o último dado conhecido
+            recent = self._recent.get(k)
+            if allow_stale and recent and (isinstance(e, CircuitOpenError) or is_transient(e)):
+                self._stale[k] = recent[2]
+                return recent[1]
+            raise
+
+    async def _load(self, k: tuple, factory, fresh: bool, adopt):
+        # Com vários processos, outro shard pode ter buscado o mesmo dado há pouco
+        if not fresh:
+            shared = await coordinator.get(k, self.min_interval)
+            if shared is not None:
+                return adopt(shared) if adopt else shared
+        result = await factory()
+        coordinator.put(k, result)
+        return result
+
+    def _finish(self, k: tuple, task: asyncio.Future):
+        if self._inflight.get(k) is task:
+            del self._inflight[k]
+        if not task.cancelled() and task.exception() is None:
+            self._recent[k] = (time.monotonic(), task.result(), time.time())
+            self._stale.pop(k, None)
+
+    def stale_since(self, keys) -> Optional[float]:
+        keys = set(keys)
+        times = [ts for k, ts in self._stale.items() if k[1] in keys]
+        return min(times) if times else None
+
+    def invalidate(self, key: str):
+        for k in [k for k in self._recent if k[1] == key]:
+            del self._recent[k]
+        coordinator.send(("invalidate", key))
+
+coalescer = RequestCoalescer(MIN_REFRESH_INTERVAL)
+
+async def fetch_account_apps(account: DiscloudAccount) -> List[AppSnapshot]:
+    def adopt(apps) -> List[AppSnapshot]:
+        # Os objetos da biblioteca são descartados aqui; painéis e cache guardam só snapshots
+        snapshots = APP_TABLE.ingest(apps)
+        for snap in snapshots:
+            APP_ACCOUNTS[snap.id] = account.name
+        return snapshots
+
+    async def load():
+        apps = await account.call(lambda: account.client.app_info("all"), "status", idempotent=True)
+        return adopt(apps if isinstance(apps, list) else [apps] if apps else [])
+    return await coalescer.run("app_info", f"all:{account.name}", load, allow_stale=True, adopt=adopt)
+
+async def fetch_all_apps(accounts: Optional[List[DiscloudAccount]] = None):
+    accounts = list(ACCOUNTS.values()) if accounts is None else accounts
+    # Busca todas as contas em paralelo; uma conta fora do ar não derruba o painel inteiro
+    results = await asyncio.gather(*(fetch_account_apps(acc) for acc in accounts), return_exceptions=True)
+    apps, errors = [], []
+    for account, result in zip(accounts, results):
+        if isinstance(result, Exception):
+            print(f"Erro ao listar apps da conta {account.name}: {result}")
+            errors.append(result)
+        else:
+            apps.extend(result)
+    if errors and len(errors) == len(accounts):
+        raise errors[0]
+    return apps
+
+async def resolve_app_account(interaction: Interaction, app_id: str) -> Optional[DiscloudAccount]:
+    allowed = accounts_for(interaction)
+    if str(app_id) not in APP_ACCOUNTS:
+        try:
+            await fetch_all_apps(allowed)
+        except Exception as e:
+            print(f"Erro ao localizar conta da app {app_id}: {e}")
+    name = APP_ACCOUNTS.get(str(app_id))
+    if name is None and len(ACCOUNTS) == 1:
+        return allowed[0] if allowed else None
+    return next((acc for acc in allowed if acc.name == name), None)
+
+async def fetch_user_info(account: DiscloudAccount):
+    return await coalescer.run("user_info", account.name, lambda: account.call(account.client.user_info, "user", idempotent=True), allow_stale=True)
+
+async def fetch_app_status(app_id: str, fresh: bool = False):
+    account = account_for_app(app_id)
+    return await coalescer.run("app_status", app_id, lambda: account.call(lambda: account.client.app_status(target=app_id), "status", idempotent=True), fresh=fresh, allow_stale=not fresh)
+
+async def fetch_app_logs(app_id: str, fresh: bool = False):
+    account = account_for_app(app_id)
+    return await coalescer.run("logs", app_id, lambda: account.call(lambda: account.client.logs(target=app_id), "logs", idempotent=True), fresh=fresh, allow_stale=not fresh)
+
+async def fetch_account_status(account: DiscloudAccount):
+    statuses = await coalescer.run("app_status", f"all:{account.name}", lambda: account.call(lambda: account.client.app_status(target="all"), "status", idempotent=True))
+    return statuses if isinstance(statuses, list) else [statuses] if statuses else []
+
+def status_started_at(status) -> Optional[float]:
+    if status.status != "Online":
+        return None
+    try:
+        return status.start_date.date.timestamp()
+    except Exception:
+        return None
+
+# --- MONITOR DE ALERTAS ---
+ALERT_CHANNEL_ID = int(os.getenv("ALERT_CHANNEL_ID", "0"))
+ALERT_POLL_INTERVAL = int(os.getenv("ALERT_POLL_INTERVAL", "120"))
+ALERT_FAST_INTERVAL = int(os.getenv("ALERT_FAST_INTERVAL", "20"))
+ALERT_OFFLINE_MINUTES = float(os.getenv("ALERT_OFFLINE_MINUTES", "5"))
+ALERT_RAM_PERCENT = float(os.getenv("ALERT_RAM_PERCENT", "90"))
+ALERT_RAM_SAMPLES = int(os.getenv("ALERT_RAM_SAMPLES", "3"))
+ALERT_RESTART_COUNT = int(os.getenv("ALERT_RESTART_COUNT", "3"))
+ALERT_RESTART_WINDOW_MINUTES = float(os.getenv("ALERT_RESTART_WINDOW_MINUTES", "15"))
+ALERT_WATCH_MARGIN = float(os.getenv("ALERT_WATCH_MARGIN", "10"))
+
+ALERT_RECOVERY_MESSAGES = {
+    "offline": f"{E_ONLINE} A aplicação voltou a ficar online.",
+    "ram": f"{E_RAM} O uso de RAM voltou ao normal.",
+    "restart_loop": "🔁 Os reinícios em sequência pararam.",
+    "ram_killed": f"{E_RAM} A flag `ramKilled` foi limpa.",
+}
+
+class AppAlertState:
+    def __init__(self):
+        self.offline_since: Optional[float] = None
+        self.ram_high = 0
+        self.last_start: Optional[float] = None
+        self.restarts: deque = deque()
+        self.ram_killed = False
+        self.active: Dict[str, str] = {}  # regra -> mensagem do alerta em aberto
+
+class AlertEngine:
+    def __init__(self):
+        self.states: Dict[str, AppAlertState] = {}
+        self.names: Dict[str, str] = {}
+        self.owners: Dict[str, str] = {}  # app_id -> conta que a listou na última varredura
+        self.watchlist: set = set()
+        self._task: Optional[asyncio.Task] = None
+        self._last_bulk = 0.0
+
+    def start(self):
+        if ALERT_CHANNEL_ID and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    def active_alerts(self, app_id: str) -> Dict[str, str]:
+        state = self.states.get(str(app_id))
+        return state.active if state else {}
+
+    async def _loop(self):
+        await bot.wait_until_ready()
+        while not bot.is_closed():
+            try:
+                # Varredura completa (1 requisição por conta) no intervalo longo;
+                # entre varreduras, só as apps perto de algum limite são consultadas
+                if time.monotonic() - self._last_bulk >= ALERT_POLL_INTERVAL:
+                    self._last_bulk = time.monotonic()
+                    await self.poll_bulk()
+                elif self.watchlist:
+                    await self.poll_watchlist()
+            except Exception as e:
+                print(f"Erro no monitor de alertas: {e}")
+            await asyncio.sleep(ALERT_FAST_INTERVAL)
+
+    async def poll_bulk(self):
+        accounts = list(ACCOUNTS.values())
+        statuses = await asyncio.gather(*(fetch_account_status(acc) for acc in accounts), return_exceptions=True)
+        infos = await asyncio.gather(*(fetch_account_apps(acc) for acc in accounts), return_exceptions=True)
+        seen, polled = set(), set()
+        for account, account_statuses, account_infos in zip(accounts, statuses, infos):
+            if isinstance(account_statuses, Exception):
+                # Conta com erro (ou circuito aberto): o estado das apps dela fica como está
+                print(f"Erro no monitor de alertas: {account_statuses}")
+                continue
+            polled.add(account.name)
+            info_map = {} if isinstance(account_infos, Exception) else {str(app.id): app for app in account_infos}
+            for status in account_statuses:
+                app_id = str(status.id)
+                seen.add(app_id)
+                self.owners[app_id] = account.name
+                info = info_map.get(app_id)
+                if info:
+                    self.names[app_id] = info.name
+                await self.evaluate(app_id, status, info)
+        # Só some do monitor a app que a própria conta deixou de listar
+        for app_id in [a for a in self.states if a not in seen and self.owners.get(a) in polled]:
+            self.states.pop(app_id, None)
+            self.owners.pop(app_id, None)
+            self.watchlist.discard(app_id)
+
+    async def poll_watchlist(self):
+        app_ids = list(self.watchlist)
+        results = await asyncio.gather(*(fetch_app_status(app_id, fresh=True) for app_id in app_ids), return_exceptions=True)
+        for app_id, status in zip(app_ids, results):
+            if not isinstance(status, Exception):
+                await self.evaluate(app_id, status, None)
+
+    async def evaluate(self, app_id: str, status, info):
+        state = self.states.setdefault(app_id, AppAlertState())
+        now = time.time()
+        firing: Dict[str, Optional[str]] = {}
+        watch = False
+
+        # Offline por N minutos
+        if status.status != "Online":
+            state.offline_since = state.offline_since or now
+            offline_for = now - state.offline_since
+            # Consulta rápida só até o alerta disparar; depois (ou se foi parada de propósito) fica com o lote
+            watch = offline_for < ALERT_OFFLINE_MINUTES * 60
+            if offline_for >= ALERT_OFFLINE_MINUTES * 60:
+                firing["offline"] = f"{E_OFFLINE} Offline há {int(offline_for // 60)} min (`{status.status}`)."
+        else:
+            state.offline_since = None
+            firing["offline"] = None
+
+        # RAM acima de X% por N amostras seguidas
+        total = parse_to_mb(status.memory.available)
+        percent = parse_to_mb(status.memory.using) / total * 100 if total > 0 else 0
+        state.ram_high = state.ram_high + 1 if percent >= ALERT_RAM_PERCENT else 0
+        watch = watch or percent >= ALERT_RAM_PERCENT - ALERT_WATCH_MARGIN
+        firing["ram"] = None
+        if state.ram_high >= ALERT_RAM_SAMPLES:
+            firing["ram"] = f"{E_RAM} RAM em **{percent:.0f}%** ({status.memory.using} / {status.memory.available}) por {state.ram_high} amostras."
+
+        # Loop de reinícios: mudanças na data de início dentro da janela
+        started = status_started_at(status)
+        if started and state.last_start and started != state.last_start:
+            state.restarts.append(now)
+        if started:
+            state.last_start = started
+        while state.restarts and now - state.restarts[0] > ALERT_RESTART_WINDOW_MINUTES * 60:
+            state.restarts.popleft()
+        watch = watch or bool(state.restarts)
+        firing["restart_loop"] = None
+        if len(state.restarts) >= ALERT_RESTART_COUNT:
+            firing["restart_loop"] = f"🔁 {len(state.restarts)} reinícios nos últimos {ALERT_RESTART_WINDOW_MINUTES:g} min."
+
+        # Flag ramKilled (só vem na listagem completa)
+        if info is not None:
+            state.ram_killed = bool(info.ramKilled)
+        firing["ram_killed"] = f"{E_WARN} A aplicação foi reiniciada por falta de RAM (`ramKilled`)." if state.ram_killed else None
+
+        if watch:
+            self.watchlist.add(app_id)
+        else:
+            self.watchlist.discard(app_id)
+
+        for rule, message in firing.items():
+            if message and rule not in state.active:
+                state.active[rule] = message
+                await self.post(app_id, message, recovered=False)
+            elif not message and rule in state.active:
+                del state.active[rule]
+                await self.post(app_id, ALERT_RECOVERY_MESSAGES[rule], recovered=True)
+
+    async def post(self, app_id: str, message: str, recovered: bool):
+        channel = bot.get_channel(ALERT_CHANNEL_ID)
+        if channel is None:
+            try:
+                channel = await bot.fetch_channel(ALERT_CHANNEL_ID)
+            except Exception as e:
+                return print(f"Canal de alertas indisponível: {e}")
+        name = self.names.get(app_id, app_id)
+        if recovered:
+            embed = discord.Embed(title=f"{E_SUCCESS} Recuperado: {name}", description=message, color=C_GREEN)
+        else:
+            embed = discord.Embed(title=f"🚨 Alerta: {name}", description=message, color=C_RED)
+        embed.add_field(name="🆔 Aplicação", value=f"`{app_id}`", inline=True)
+        embed.set_footer(text="Discloud Manager • Monitor de alertas")
+        embed.timestamp = datetime.now()
+        try:
+            await channel.send(embed=embed)
+        except Exception as e:
+            print(f"Erro ao enviar alerta: {e}")
+
+alert_engine = AlertEngine()
+
+# --- RASTREADOR DE OPERAÇÕES (CONVERGÊNCIA DE ESTADO) ---
+OP_CONVERGE_TIMEOUT = float(os.getenv("OP_CONVERGE_TIMEOUT", "120"))
+OP_LABELS = {"start": "Iniciar", "stop": "Parar", "restart": "Reiniciar"}
+
+class OperationTracker:
+    def __init__(self):
+        self.history: Dict[tuple, deque] = {}  # (app_id, operação) -> segundos até convergir
+        self._tasks: set = set()
+
+    @staticmethod
+    def reached(op: str, status, previous_start: Optional[float]) -> bool:
+        if op == "stop":
+            return status.status != "Online"
+        if op == "restart":
+            started = status_started_at(status)
+            return started is not None and started != previous_start
+        return status.status == "Online"
+
+    async def wait_for(self, app_id: str, op: str, previous_start: Optional[float] = None, timeout: float = OP_CONVERGE_TIMEOUT, record: bool = True):
+        begin = time.monotonic()
+        delay = 1.0
+        while True:
+            try:
+                status = await fetch_app_status(app_id, fresh=True)
+                if self.reached(op, status, previous_start):
+                    elapsed = time.monotonic() - begin
+                    if record:
+                        self.history.setdefault((app_id, op), deque(maxlen=20)).append(elapsed)
+                    return True, elapsed
+            except Exception as e:
+                print(f"Erro ao acompanhar {op} de {app_id}: {e}")
+            remaining = begin + timeout - time.monotonic()
+            if remaining <= 0:
+                return False, time.monotonic() - begin
+            # Backoff exponencial: consultas rápidas no início, espaçadas depois
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 15)
+
+    def track(self, app_id: str, op: str, on_done, previous_start: Optional[float] = None):
+        async def runner():
+            converged, elapsed = await self.wait_for(app_id, op, previous_start)
+            try:
+                await on_done(converged, elapsed)
+            except Exception as e:
+                print(f"Erro ao notificar {op} de {app_id}: {e}")
+        task = asyncio.create_task(runner())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def average(self, app_id: str, op: str) -> Optional[float]:
+        samples = self.history.get((app_id, op))
+        return sum(samples) / len(samples) if samples else None
+
+op_tracker = OperationTracker()
+
+# --- FILA DE OPERAÇÕES POR APP (SERIALIZAÇÃO + DEDUP) ---
+OP_QUEUE_LABELS = {
+    **OP_LABELS, "ram": "Alterar RAM", "commit": "Commit", "deploy": "Deploy verificado", "delete": "Deletar",
+    "profile": "Perfil", "mod_add": "Adicionar mod", "mod_edit": "Editar mod", "mod_delete": "Remover mod",
+}
+
+class QueuedOperation:
+    def __init__(self, op: str, key: Optional[tuple], by: Optional[str]):
+        self.op = op
+        self.key = key
+        self.by = by
+        self.merged = 0
+        self.enqueued = time.monotonic()
+        self.started: Optional[float] = None
+        self.future = asyncio.get_running_loop().create_future()
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())  # evita aviso de erro não lido
+
+class OperationQueue:
+    def __init__(self):
+        self.pending: Dict[str, List[QueuedOperation]] = {}  # app_id -> operação em curso + fila
+        self.waits: Dict[str, deque] = {}  # app_id -> segundos esperando na fila
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def submit(self, app_id: str, op: str, factory, key=None, by: Optional[str] = None):
+        # Operações que mudam a app rodam uma por vez; um pedido idêntico ao último da fila reaproveita o resultado
+        app_id = str(app_id)
+        pending = self.pending.setdefault(app_id, [])
+        full_key = (op, key) if key is not None else None
+        if full_key is not None and pending and pending[-1].key == full_key:
+            pending[-1].merged += 1
+            return await asyncio.shield(pending[-1].future)
+
+        entry = QueuedOperation(op, full_key, by)
+        pending.append(entry)
+        lock = self._locks.setdefault(app_id, asyncio.Lock())
+        try:
+            async with lock:
+                entry.started = time.monotonic()
+                self.waits.setdefault(app_id, deque(maxlen=20)).append(entry.started - entry.enqueued)
+                result = await factory()
+            entry.future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            entry.future.cancel()
+            raise
+        except Exception as e:
+            entry.future.set_exception(e)
+            raise
+        finally:
+            pending.remove(entry)
+            if not pending:
+                self.pending.pop(app_id, None)
+                self._locks.pop(app_id, None)
+
+    def describe(self, app_id: str) -> List[str]:
+        now = time.monotonic()
+        lines = []
+        for entry in self.pending.get(str(app_id), []):
+            label = OP_QUEUE_LABELS.get(entry.op, entry.op)
+            who = f" • {entry.by}" if entry.by else ""
+            merged = f" (+{entry.merged} iguais)" if entry.merged else ""
+            if entry.started is not None:
+                lines.append(f"▶️ {label}{who} • rodando há `{now - entry.started:.0f}s`{merged}")
+            else:
+                lines.append(f"⏳ {label}{who} • na fila há `{now - entry.enqueued:.0f}s`{merged}")
+        return lines
+
+    def average_wait(self, app_id: str) -> Optional[float]:
+        samples = self.waits.get(str(app_id))
+        return sum(samples) / len(samples) if samples else None
+
+op_queue = OperationQueue()
+
+async def change_app_ram(app_id: str, amount: int, by: Optional[str] = None):
+    account = account_for_app(app_id)
+
+    async def change_ram():
+        # RAM + religar é uma operação só na fila: nada entra entre o stop e o start
+        result = await account.call(lambda: account.client.ram(app_id=app_id, new_ram=amount))
+        restarted = False
+        if result.status == "ok":
+            try:
+                # Espera a Discloud realmente desligar a app antes de religar
+                await op_tracker.wait_for(app_id, "stop", timeout=30, record=False)
+                await account.call(lambda: account.client.start(app_id))
+                restarted = True
+            except: pass
+        return result, restarted
+    result, restarted = await op_queue.submit(app_id, "ram", change_ram, key=amount, by=by)
+    coalescer.invalidate(app_id)
+    return result, restarted
+
+# --- PIPELINE DE DEPLOY (COMMIT COM VERIFICAÇÃO DE SAÚDE) ---
+DEPLOY_HEALTH_WINDOW = int(os.getenv("DEPLOY_HEALTH_WINDOW", "60"))
+DEPLOY_HEALTH_INTERVAL = 10
+DEPLOY_HISTORY_SIZE = 10
+DEPLOY_CRASH_PATTERN = re.compile(r"Traceback \(most recent call last\)|UnhandledPromiseRejection|Uncaught \w*Error|^\w*Error: ", re.MULTILINE)
+DEPLOY_HISTORY: Dict[str, deque] = {}  # app_id -> últimos deploys verificados
+
+class DeployPipeline:
+    def __init__(self, account: DiscloudAccount, app_id: str, filename: str, health_window: int, on_progress):
+        self.account = account
+        self.app_id = app_id
+        self.filename = filename
+        self.health_window = health_window
+        self.on_progress = on_progress
+        self.stages: List[Dict] = []  # {"name", "seconds", "ok", "detail"}
+        self.outcome = "running"
+
+    async def _stage(self, name: str, factory):
+        begin = time.monotonic()
+        stage = {"name": name, "seconds": None, "ok": None, "detail": ""}
+        self.stages.append(stage)
+        await self.on_progress(self)
+        try:
+            ok, detail, value = await factory()
+        except Exception as e:
+            ok, detail, value = False, str(e), None
+        stage.update(seconds=time.monotonic() - begin, ok=ok, detail=detail)
+        await self.on_progress(self)
+        return ok, value
+
+    async def _download_backup(self):
+        backup = await self.account.call(lambda: self.account.client.backup(self.app_id), "backup", idempotent=True)
+        url = backup.url if not isinstance(backup, list) else backup[0].url
+        # Arquivo temporário em disco acima de 8MB para não segurar zips grandes na RAM
+        spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        async with download_session().get(url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                spool.write(chunk)
+        size = spool.tell()
+        spool.seek(0)
+        return True, f"{size / 1024 / 1024:.1f}MB", spool
+
+    async def _commit(self, fp, filename: str):
+        d_file = discloud.File(fp)
+        d_file.filename = filename
+        res = await self.account.call(lambda: self.account.client.commit(self.app_id, d_file))
+        coalescer.invalidate(self.app_id)
+        return res.status == "ok", res.message or "", res
+
+    async def _wait_online(self, previous_start: Optional[float]):
+        converged, elapsed = await op_tracker.wait_for(self.app_id, "restart", previous_start)
+        if not converged:
+            return False, f"Não ficou online em {elapsed:.0f}s.", None
+        return True, "Online.", status_started_at(await fetch_app_status(self.app_id))
+
+    async def _watch_health(self, started_at: Optional[float]):
+        # Erro da API/rede ao monitorar não é sinal de saúde: pula a amostra em vez de reverter o deploy
+        deadline = time.monotonic() + self.health_window
+        skipped = 0
+        while time.monotonic() < deadline:
+            await asyncio.sleep(min(DEPLOY_HEALTH_INTERVAL, max(0, deadline - time.monotonic())))
+            try:
+                status = await fetch_app_status(self.app_id, fresh=True)
+            except Exception as e:
+                skipped += 1
+                print(f"Erro ao checar saúde de {self.app_id}: {e}")
+                continue
+            if status.status != "Online":
+                return False, f"Container `{status.status}` durante a janela de saúde.", None
+            if started_at and status_started_at(status) != started_at:
+                return False, "A aplicação reiniciou durante a janela de saúde (crash loop).", None
+        logs = None
+        for attempt in range(3):
+            try:
+                logs = await fetch_app_logs(self.app_id, fresh=True)
+                break
+            except Exception as e:
+                print(f"Erro ao ler logs de {self.app_id} na verificação: {e}")
+                await asyncio.sleep(DEPLOY_HEALTH_INTERVAL / 2)
+        match = DEPLOY_CRASH_PATTERN.search(logs.small or "") if logs else None
+        if match:
+            return False, f"Erro nos logs: `{match.group(0).strip()[:80]}`", None
+        notes = []
+        if skipped:
+            notes.append(f"{skipped} checagens puladas por erro da API")
+        if logs is None:
+            notes.append("logs indisponíveis")
+        extra = f" ({', '.join(notes)})" if notes else ""
+        return True, f"Estável por {self.health_window}s{extra}.", None
+
+    async def run(self, fp) -> bool:
+        ok, backup_fp = await self._stage("💾 Backup", self._download_backup)
+        if not ok:
+            self.outcome = "failed"
+            return self._finish()
+        try:
+            previous_start = None
+            try:
+                previous_start = status_started_at(await fetch_app_status(self.app_id, fresh=True))
+            except Exception:
+                pass
+
+            ok, _ = await self._stage("📤 Upload", lambda: self._commit(fp, self.filename))
+            if not ok:
+                self.outcome = "failed"
+                return self._finish()
+
+            ok, started_at = await self._stage("🏗️ Build até online", lambda: self._wait_online(previous_start))
+            if ok:
+                ok, _ = await self._stage("🩺 Saúde", lambda: self._watch_health(started_at))
+            if ok:
+                self.outcome = "ok"
+                return self._finish()
+
+            backup_fp.seek(0)
+            ok, _ = await self._stage("⏪ Rollback", lambda: self._commit(backup_fp, f"rollback-{self.app_id}.zip"))
+            self.outcome = "rollback" if ok else "rollback_failed"
+            return self._finish()
+        finally:
+            backup_fp.close()
+
+    def _finish(self) -> bool:
+        DEPLOY_HISTORY.setdefault(self.app_id, deque(maxlen=DEPLOY_HISTORY_SIZE)).append({
+            "timestamp": datetime.now(),
+            "filename": self.filename,
+            "outcome": self.outcome,
+            "stages": [(st["name"], st["seconds"], st["ok"]) for st in self.stages],
+        })
+        return self.outcome == "ok"
+
+DEPLOY_OUTCOMES = {
+    "running": (f"{E_LOADING} Deploy em andamento", C_GOLD),
+    "ok": (f"{E_SUCCESS} Deploy Saudável!", C_GREEN),
+    "failed": (f"{E_ERROR} Falha no Deploy", C_RED),
+    "rollback": (f"⏪ Deploy Revertido", C_GOLD),
+    "rollback_failed": (f"{E_ERROR} Rollback Falhou", C_RED),
+}
+
+def build_deploy_embed(pipeline: DeployPipeline) -> discord.Embed:
+    title, color = DEPLOY_OUTCOMES[pipeline.outcome]
+    embed = discord.Embed(title=title, description=f"Aplicação `{pipeline.app_id}` • `{pipeline.filename}`", color=color)
+    for stage in pipeline.stages:
+        icon = E_LOADING if stage["ok"] is None else (E_SUCCESS if stage["ok"] else E_ERROR)
+        took = f" • `{stage['seconds']:.1f}s`" if stage["seconds"] is not None else ""
+        detail = f"\n{stage['detail'][:200]}" if stage["detail"] else ""
+        embed.add_field(name=f"{icon} {stage['name']}{took}", value=f"{detail or '...'}", inline=False)
+    embed.set_footer(text="Discloud Manager • Deploy verificado")
+    embed.timestamp = datetime.now()
+    return embed
+
+# --- ANÁLISE DE LOGS (DIAGNÓSTICO) ---
+LOG_ANALYSIS_TTL = int(os.getenv("LOG_ANALYSIS_TTL", "120"))
+LOG_ANALYSIS_MAX_MB = float(os.getenv("LOG_ANALYSIS_MAX_MB", "20"))
+LOG_WINDOW_MINUTES = 5
+LOG_LINE_MAX_BYTES = 16 * 1024  # linhas gigantes (dumps JSON, JS minificado) são cortadas aqui
+LOG_WINDOWS_SHOWN = 6
+
+LOG_PY_TRACEBACK = re.compile(r"^Traceback \(most recent call last\):")
+LOG_PY_FRAME = re.compile(r'^\s+File "(?P<file>[^"]+)", line \d+, in (?P<func>\S+)')
+LOG_PY_EXCEPTION = re.compile(r"^(?P<type>[A-Za-z_][\w.]*(?:Error|Exception|Exit|Interrupt))(?::\s*(?P<msg>.*))?$")
+LOG_NODE_ERROR = re.compile(r"^(?:Uncaught\s+)?(?P<type>[A-Z]\w*Error|UnhandledPromiseRejection\w*)(?:\s*\[\w+\])?:\s*(?P<msg>.*)$")
+LOG_NODE_FRAME = re.compile(r"^\s+at (?:(?P<func>[^\s(]+) \()?(?P<file>[^():]+)")
+LOG_LEVEL = re.compile(r"\b(?P<level>CRITICAL|FATAL|ERROR|WARNING|WARN)\b")
+LOG_TIMESTAMP = re.compile(r"(?P<date>\d{4}-\d{2}-\d{2})[ T](?P<time>\d{2}:\d{2}:\d{2})")
+LOG_ANSI = re.compile(r"\x1b\[[0-9;]*m")
+# Tira o que muda a cada ocorrência (ids, números, textos entre aspas) para agrupar a mesma exceção
+LOG_NORMALIZERS = [
+    (re.compile(r"0x[0-9a-fA-F]+"), "0x…"),
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE), "<uuid>"),
+    (re.compile(r"'[^']*'|\"[^\"]*\"|`[^`]*`"), "'…'"),
+    (re.compile(r"\d+"), "N"),
+]
+
+def normalize_signature(exc_type: str, message: str, where: Optional[str]) -> str:
+    message = (message or "").strip()
+    for pattern, replacement in LOG_NORMALIZERS:
+        message = pattern.sub(replacement, message)
+    signature = f"{exc_type}: {message[:100]}" if message else exc_type
+    return f"{signature} @ {where}" if where else signature
+
+class LogAnalysis:
+    def __init__(self):
+        self.lines = 0
+        self.bytes = 0
+        self.levels: Dict[str, int] = {"error": 0, "warning": 0}
+        self.signatures: Dict[str, int] = {}
+        self.windows: Dict[datetime, int] = {}  # início da janela -> erros
+        self.truncated = False
+        self.seconds = 0.0
+        self.analyzed_at = time.time()
+        self._now: Optional[datetime] = None  # último horário visto (tracebacks não têm data)
+        self._py_frame: Optional[str] = None
+        self._in_py_traceback = False
+        self._node_pending: Optional[tuple] = None
+
+    @property
+    def exceptions(self) -> int:
+        return sum(self.signatures.values())
+
+    def _error_event(self):
+        if self._now is not None:
+            bucket = self._now.replace(minute=self._now.minute - self._now.minute % LOG_WINDOW_MINUTES, second=0)
+            self.windows[bucket] = self.windows.get(bucket, 0) + 1
+
+    def _exception(self, exc_type: str, message: str, where: Optional[str]):
+        signature = normalize_signature(exc_type, message, where)
+        self.signatures[signature] = self.signatures.get(signature, 0) + 1
+        self._error_event()
+
+    def _flush_node(self, where: Optional[str] = None):
+        if self._node_pending:
+            self._exception(*self._node_pending, where)
+            self._node_pending = None
+
+    def feed(self, line: str):
+        # Uma passada por linha: cada padrão é testado no máximo uma vez
+        self.lines += 1
+        line = LOG_ANSI.sub("", line.rstrip("\r\n"))
+        ts = LOG_TIMESTAMP.search(line)
+        if ts:
+            try:
+                self._now = datetime.fromisoformat(f"{ts.group('date')} {ts.group('time')}")
+            except ValueError:
+                pass
+
+        if self._in_py_traceback:
+            frame = LOG_PY_FRAME.match(line)
+            if frame:
+                self._py_frame = f"{os.path.basename(frame.group('file'))}:{frame.group('func')}"
+                return
+            if line.startswith((" ", "\t")) or not line.strip():
+                return
+            self._in_py_traceback = False
+            exc = LOG_PY_EXCEPTION.match(line)
+            if exc:
+                self._exception(exc.group("type"), exc.group("msg"), self._py_frame)
+                return
+        if self._node_pending:
+            frame = LOG_NODE_FRAME.match(line)
+            if frame:
+                where = os.path.basename(frame.group("file").strip())
+                self._flush_node(f"{where}:{frame.group('func')}" if frame.group("func") else where)
+                return
+            self._flush_node()
+
+        if LOG_PY_TRACEBACK.match(line):
+            self._in_py_traceback = True
+            self._py_frame = None
+            return
+        node = LOG_NODE_ERROR.match(line)
+        if node:
+            self._node_pending = (node.group("type"), node.group("msg"))
+            return
+        level = LOG_LEVEL.search(line)
+        if level:
+            if level.group("level") in ("WARNING", "WARN"):
+                self.levels["warning"] += 1
+            else:
+                self.levels["error"] += 1
+                self._error_event()
+
+    def finish(self):
+        self._flush_node()
+        self.seconds = time.time() - self.analyzed_at
+
+    def top_signatures(self, limit: int = 5) -> List[tuple]:
+        return sorted(self.signatures.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def recent_windows(self) -> List[tuple]:
+        return sorted(self.windows.items())[-LOG_WINDOWS_SHOWN:]
+
+class LogAnalyzer:
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._entries: Dict[str, LogAnalysis] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def peek(self, app_id: str) -> Optional[LogAnalysis]:
+        entry = self._entries.get(str(app_id))
+        return entry if entry and time.time() - entry.analyzed_at < self.ttl else None
+
+    async def get(self, app_id: str, force: bool = False) -> LogAnalysis:
+        app_id = str(app_id)
+        async with self._locks.setdefault(app_id, asyncio.Lock()):
+            cached = None if force else self.peek(app_id)
+            if cached is not None:
+                return cached
+            logs = await fetch_app_logs(app_id, fresh=force)
+            analysis = LogAnalysis()
+            if logs.url:
+                await self._stream(logs.url, analysis)
+            else:
+                for line in (logs.small or "").splitlines():
+                    analysis.bytes += len(line)
+                    analysis.feed(line)
+            analysis.finish()
+            self._entries[app_id] = analysis
+            return analysis
+
+    async def _stream(self, url: str, analysis: LogAnalysis):
+        # Lê o log completo linha a linha, sem montar o texto inteiro na memória
+        limit = LOG_ANALYSIS_MAX_MB * 1024 * 1024
+        # Separa as linhas na mão: o leitor de linhas do aiohttp estoura em linhas acima de ~128KB
+        buffer = b""
+        skipping = False  # descartando o resto de uma linha longa já cortada
+        async with download_session().get(url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                analysis.bytes += len(chunk)
+                buffer += chunk
+                while True:
+                    end = buffer.find(b"\n")
+                    if end < 0:
+                        if len(buffer) > LOG_LINE_MAX_BYTES:
+                            if not skipping:
+                                analysis.feed(buffer[:LOG_LINE_MAX_BYTES].decode("utf-8", errors="replace"))
+                                skipping = True
+                            buffer = b""
+                        break
+                    line, buffer = buffer[:end], buffer[end + 1:]
+                    if not skipping:
+                        analysis.feed(line[:LOG_LINE_MAX_BYTES].decode("utf-8", errors="replace"))
+                    skipping = False
+                if analysis.bytes >= limit:
+                    analysis.truncated = True
+                    break
+            else:
+                if buffer and not skipping:
+                    analysis.feed(buffer[:LOG_LINE_MAX_BYTES].decode("utf-8", errors="replace"))
+
+    def invalidate(self, app_id: str):
+        self._entries.pop(str(app_id), None)
+
+log_analyzer = LogAnalyzer(LOG_ANALYSIS_TTL)
+
+def build_diagnostics_embed(app_name: str, analysis: LogAnalysis) -> discord.Embed:
+    errors = analysis.levels["error"] + analysis.exceptions
+    color = C_RED if analysis.exceptions else C_GOLD if errors else C_GREEN
+    embed = discord.Embed(title=f"🩺 Diagnóstico: {app_name}", color=color)
+    rate = errors / analysis.lines * 1000 if analysis.lines else 0
+    embed.description = (
+        f"**{analysis.lines:,}** linhas (`{analysis.bytes / 1024:.0f}KB`) analisadas em `{analysis.seconds:.1f}s`"
+        + (" — *log cortado no limite*" if analysis.truncated else "")
+        + f"\n{E_ERROR} `{analysis.exceptions}` exceções • `{analysis.levels['error']}` linhas de erro • "
+        f"{E_WARN} `{analysis.levels['warning']}` avisos • `{rate:.1f}` erros/1000 linhas"
+    )
+    top = analysis.top_signatures()
+    if top:
+        value = "\n".join(f"`{count}×` {signature[:150]}" for signature, count in top)
+        embed.add_field(name="🧬 Exceções mais frequentes", value=value[:1024], inline=False)
+    windows = analysis.recent_windows()
+    if windows:
+        value = "\n".join(
+            f"`{start:%d/%m %H:%M}` {count} erros ({count / LOG_WINDOW_MINUTES:.1f}/min)"
+            for start, count in windows
+        )
+        embed.add_field(name=f"📈 Erros por janela de {LOG_WINDOW_MINUTES}min", value=value, inline=False)
+    elif errors:
+        embed.add_field(name="📈 Erros por janela", value="Os logs não têm data/hora para separar por janela.", inline=False)
+    if not errors and not analysis.levels["warning"]:
+        embed.add_field(name=f"{E_SUCCESS} Tudo limpo", value="Nenhum erro ou traceback encontrado nos logs.", inline=False)
+    embed.set_footer(text=f"Discloud Manager • Diagnóstico (cache de {LOG_ANALYSIS_TTL}s)")
+    embed.timestamp = datetime.fromtimestamp(analysis.analyzed_at)
+    return embed
+
+# --- BACKUPS AGENDADOS (ARMAZENAMENTO LOCAL COM DEDUP) ---
+BACKUP_INTERVAL_HOURS = float(os.getenv("BACKUP_INTERVAL_HOURS", "0"))
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+BACKUP_CONCURRENCY = int(os.getenv("BACKUP_CONCURRENCY", "3"))
+BACKUP_KEEP_DAILY = int(os.getenv("BACKUP_KEEP_DAILY", "7"))
+BACKUP_KEEP_WEEKLY = int(os.getenv("BACKUP_KEEP_WEEKLY", "4"))
+BACKUP_CHUNK_SIZE = 64 * 1024
+
+class BackupStore:
+    def __init__(self, root: str):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.index_path = os.path.join(root, "index.json")
+        self._index: Optional[Dict[str, List[Dict]]] = None
+
+    @property
+    def index(self) -> Dict[str, List[Dict]]:
+        # app_id -> snapshots (mais antigo primeiro); lido do disco só quando usado
+        if self._index is None:
+            self._index = self._load()
+        return self._index
+
+    def _load(self) -> Dict[str, List[Dict]]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Erro ao ler índice de backups: {e}")
+            return {}
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(self.index, fh)
+        os.replace(tmp_path, self.index_path)
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, f"{digest}.zip")
+
+    async def store_stream(self, app_id: str, response: aiohttp.ClientResponse):
+        # Grava em disco chunk a chunk calculando o hash; o zip nunca fica inteiro na memória
+        os.makedirs(self.objects_dir, exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                async for chunk in response.content.iter_chunked(BACKUP_CHUNK_SIZE):
+                    hasher.update(chunk)
+                    fh.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            deduped = os.path.exists(self.object_path(digest))
+            if deduped:
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, self.object_path(digest))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        snapshot = {"ts": time.time(), "hash": digest, "size": size}
+        self.index.setdefault(app_id, []).append(snapshot)
+        return snapshot, deduped
+
+    def snapshots(self, app_id: str) -> List[Dict]:
+        return list(reversed(self.index.get(app_id, [])))
+
+    def apply_retention(self, app_id: str):
+        # Mantém o mais recente de cada um dos últimos N dias e das últimas N semanas
+        keep, days, weeks = set(), set(), set()
+        for snap in self.snapshots(app_id):
+            moment = datetime.fromtimestamp(snap["ts"])
+            day = moment.date()
+            week = moment.isocalendar()[:2]
+            if day not in days and len(days) < BACKUP_KEEP_DAILY:
+                days.add(day)
+                keep.add(snap["ts"])
+            if week not in weeks and len(weeks) < BACKUP_KEEP_WEEKLY:
+                weeks.add(week)
+                keep.add(snap["ts"])
+        self.index[app_id] = [snap for snap in self.index.get(app_id, []) if snap["ts"] in keep]
+
+    def collect_garbage(self) -> int:
+        referenced = {snap["hash"] for snaps in self.index.values() for snap in snaps}
+        removed = 0
+        if not os.path.isdir(self.objects_dir):
+            return removed
+        for entry in os.scandir(self.objects_dir):
+            digest = entry.name.rsplit(".", 1)[0]
+            if entry.name.endswith(".zip") and digest not in referenced:
+                os.remove(entry.path)
+                removed += 1
+        return removed
+
+    def disk_usage(self) -> int:
+        if not os.path.isdir(self.objects_dir):
+            return 0
+        return sum(entry.stat().st_size for entry in os.scandir(self.objects_dir) if entry.name.endswith(".zip"))
+
+class BackupScheduler:
+    def __init__(self, store: BackupStore):
+        self.store = store
+        self.last_run: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def start(self):
+        if BACKUP_INTERVAL_HOURS > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def _loop(self):
+        await bot.wait_until_ready()
+        while not bot.is_closed():
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Erro no backup agendado: {e}")
+            await asyncio.sleep(BACKUP_INTERVAL_HOURS * 3600)
+
+    async def backup_app(self, app_id: str):
+        account = account_for_app(app_id)
+        backup = await account.call(lambda: account.client.backup(app_id), "backup", idempotent=True)
+        url = backup.url if not isinstance(backup, list) else backup[0].url
+        async with download_session().get(url) as response:
+            response.raise_for_status()
+            return await self.store.store_stream(app_id, response)
+
+    async def run_once(self) -> Dict:
+        async with self._lock:
+            begin = time.monotonic()
+            apps = await fetch_all_apps()
+            limit = asyncio.Semaphore(BACKUP_CONCURRENCY)
+
+            async def one(app_id: str):
+                async with limit:
+                    return await self.backup_app(app_id)
+
+            app_ids = [str(app.id) for app in apps]
+            results = await asyncio.gather(*(one(app_id) for app_id in app_ids), return_exceptions=True)
+            summary = {"ts": time.time(), "saved": 0, "deduped": 0, "errors": 0, "bytes": 0}
+            for app_id, result in zip(app_ids, results):
+                if isinstance(result, Exception):
+                    summary["errors"] += 1
+                    print(f"Erro no backup de {app_id}: {result}")
+                    continue
+                snapshot, deduped = result
+                summary["deduped" if deduped else "saved"] += 1
+                if not deduped:
+                    summary["bytes"] += snapshot["size"]
+                self.store.apply_retention(app_id)
+            self.store.save()
+            summary["removed"] = self.store.collect_garbage()
+            summary["seconds"] = time.monotonic() - begin
+            self.last_run = summary
+            print(f"💾 Backups: {summary['saved']} novos, {summary['deduped']} sem mudança, {summary['errors']} erros em {summary['seconds']:.0f}s")
+            return summary
+
+backup_scheduler = BackupScheduler(BackupStore(BACKUP_DIR))
+
+# --- RELATÓRIO DA FROTA (EXPORTAÇÃO CSV/JSON) ---
+REPORT_CONCURRENCY = int(os.getenv("REPORT_CONCURRENCY", "4"))
+REPORT_FIELDS = [
+    "account", "app_id", "name", "lang", "status", "ram_used_mb", "ram_allocated_mb", "ram_percent",
+    "cpu_percent", "net_down_mb", "net_up_mb", "uptime_seconds", "auto_restart", "mods",
+]
+
+def report_row(account: DiscloudAccount, status, info: Optional[AppSnapshot], mods: Optional[int]) -> Dict:
+    used = parse_to_mb(status.memory.using)
+    allocated = parse_to_mb(status.memory.available)
+    started = status_started_at(status)
+    return {
+        "account": account.name,
+        "app_id": str(status.id),
+        "name": info.name if info else None,
+        "lang": info.lang if info else None,
+        "status": status.status,
+        "ram_used_mb": round(used, 1),
+        "ram_allocated_mb": round(allocated, 1),
+        "ram_percent": round(used / allocated * 100, 1) if allocated else None,
+        "cpu_percent": parse_percent(status.cpu),
+        "net_down_mb": round(parse_to_mb(status.net_info.download), 2),
+        "net_up_mb": round(parse_to_mb(status.net_info.upload), 2),
+        "uptime_seconds": int(time.time() - started) if started else 0,
+        "auto_restart": bool(info.autoRestart) if info else None,
+        "mods": mods,
+    }
+
+async def iter_report_rows(accounts: List[DiscloudAccount]):
+    # Status e info vêm em lote por conta; só a contagem de mods é por app (limitada por REPORT_CONCURRENCY)
+    limit = asyncio.Semaphore(REPORT_CONCURRENCY)
+
+    async def build(account, status, info):
+        async with limit:
+            try:
+                mods = len(await mods_cache.get(str(status.id)))
+            except Exception as e:
+                print(f"Erro ao contar mods de {status.id}: {e}")
+                mods = None
+        return report_row(account, status, info, mods)
+
+    for account in accounts:
+        try:
+            statuses, infos = await asyncio.gather(fetch_account_status(account), fetch_account_apps(account))
+        except Exception as e:
+            print(f"Erro no relatório da conta {account.name}: {e}")
+            continue
+        info_map = {str(app.id): app for app in infos}
+        tasks = [asyncio.ensure_future(build(account, st, info_map.get(str(st.id)))) for st in statuses]
+        # As linhas saem na ordem em que ficam prontas, sem esperar a frota inteira
+        for done in asyncio.as_completed(tasks):
+            yield await done
+
+async def write_report(accounts: List[DiscloudAccount], fmt: str):
+    import csv  # só carregado quando alguém pede um /report
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    out = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+    count = 0
+    try:
+        if fmt == "csv":
+            writer = csv.DictWriter(out, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            async for row in iter_report_rows(accounts):
+                writer.writerow(row)
+                count += 1
+        else:
+            out.write("[")
+            async for row in iter_report_rows(accounts):
+                out.write(("," if count else "") + "\n  " + json.dumps(row, ensure_ascii=False))
+                count += 1
+            out.write("\n]\n")
+    except BaseException:
+        out.close()  # fecha também o spool
+        raise
+    out.flush()
+    out.detach()  # devolve o spool sem fechá-lo
+    spool.seek(0)
+    return spool, count
+
+# --- REGISTRO DE PAINÉIS ABERTOS (LIMITE DE MEMÓRIA) ---
+VIEW_CAP_PER_USER = int(os.getenv("VIEW_CAP_PER_USER", "3"))
+VIEW_CAP_GLOBAL = int(os.getenv("VIEW_CAP_GLOBAL", "200"))
+
+def approx_size(obj) -> int:
+    # Estimativa rasa: o objeto, seu __dict__ e um nível de listas/dicts guardados nele
+    size = sys.getsizeof(obj)
+    attrs = getattr(obj, "__dict__", None)
+    if attrs:
+        size += sys.getsizeof(attrs)
+        for value in attrs.values():
+            size += sys.getsizeof(value)
+            if isinstance(value, (list, tuple, set)):
+                size += sum(sys.getsizeof(v) for v in value)
+            elif isinstance(value, dict):
+                size += sum(sys.getsizeof(v) for v in value.values())
+    return size
+
+class ViewEntry:
+    __slots__ = ("view", "user_id", "message", "children", "active")
+
+    def __init__(self, view: View, user_id: int, message: Optional[discord.Message]):
+        self.view = view
+        self.user_id = user_id
+        self.message = message
+        self.children: List[View] = []  # sub-painéis (mods) abertos a partir deste
+        self.active: View = view  # painel exibido agora na mensagem
+
+class ViewRegistry:
+    def __init__(self):
+        self._entries: "OrderedDict[int, ViewEntry]" = OrderedDict()  # LRU: mais recente no fim
+        self._roots: Dict[int, int] = {}  # id(sub-painel) -> id(painel raiz)
+        self.evicted = 0
+
+    def _entry_for(self, view: View) -> Optional[ViewEntry]:
+        return self._entries.get(self._roots.get(id(view), id(view)))
+
+    def register(self, view: View, user_id: Optional[int] = None, message: Optional[discord.Message] = None, parent: Optional[View] = None):
+        if parent is not None:
+            entry = self._entry_for(parent)
+            if entry is None:
+                return
+            root_key = id(entry.view)
+            entry.children.append(view)
+            entry.active = view
+            self._roots[id(view)] = root_key
+            self._entries.move_to_end(root_key)
+            return
+        self._entries[id(view)] = ViewEntry(view, user_id, message)
+        self._enforce_caps(user_id)
+
+    def touch(self, view: View, message: Optional[discord.Message] = None):
+        entry = self._entry_for(view)
+        if entry is None:
+            return
+        entry.active = view
+        if message is not None:
+            entry.message = message
+        self._entries.move_to_end(id(entry.view))
+
+    def unregister(self, view: View):
+        root_key = self._roots.pop(id(view), None)
+        if root_key is not None:
+            entry = self._entries.get(root_key)
+            if entry and view in entry.children:
+                entry.children.remove(view)
+            return
+        entry = self._entries.pop(id(view), None)
+        if entry:
+            for child in entry.children:
+                self._roots.pop(id(child), None)
+
+    def _enforce_caps(self, user_id: int):
+        user_keys = [key for key, entry in self._entries.items() if entry.user_id == user_id]
+        while len(user_keys) > VIEW_CAP_PER_USER:
+            self.evict(user_keys.pop(0))
+        while len(self._entries) > VIEW_CAP_GLOBAL:
+            self.evict(next(iter(self._entries)))
+
+    def evict(self, key: int):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.evicted += 1
+        for child in entry.children:
+            self._roots.pop(id(child), None)
+            child.stop()
+        entry.view.stop()
+        if entry.message is not None:
+            # Desativa os botões do painel que estava na tela para o usuário saber que expirou
+            for item in entry.active.children:
+                item.disabled = True
+            asyncio.create_task(self._disable_message(entry.message, entry.active))
+
+    @staticmethod
+    async def _disable_message(message: discord.Message, view: View):
+        try:
+            await message.edit(view=view)
+        except Exception as e:
+            print(f"Erro ao desativar painel despejado: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        children = sum(len(entry.children) for entry in self._entries.values())
+        retained = sum(
+            approx_size(entry.view) + sum(approx_size(item) for item in entry.view.children)
+            + sum(approx_size(child) for child in entry.children)
+            for entry in self._entries.values()
+        )
+        return {"views": len(self._entries), "children": children, "bytes": retained, "evicted": self.evicted}
+
+view_registry = ViewRegistry()
+
+class TrackedView(View):
+    async def interaction_check(self, interaction: Interaction) -> bool:
+        view_registry.touch(self, interaction.message)
+        if profiler.enabled:
+            custom_id = (interaction.data or {}).get("custom_id")
+            item = next((c for c in self.children if getattr(c, "custom_id", None) == custom_id), None)
+            label = getattr(item, "label", None) or getattr(item, "placeholder", None) or custom_id
+            profiler.start(f"{type(self).__name__}: {label}", str(interaction.user))
+        return True
+
+    async def on_timeout(self):
+        view_registry.unregister(self)
 
 # --- VIEWS E SELECTS ESPECÍFICOS PARA MODS ---
 
@@ -128,13 +2027,14 @@ class PermissionSelect(Select):
     async def callback(self, interaction: Interaction):
         await interaction.response.defer()
 
-class ModRightsView(View):
+class ModRightsView(TrackedView):
     def __init__(self, app_id: str, mod_id: str, mode: str, dashboard_view, current_perms: List[str] = None):
         super().__init__(timeout=300)
         self.app_id = app_id
         self.mod_id = mod_id
         self.mode = mode 
         self.dashboard_view = dashboard_view
+        view_registry.register(self, parent=dashboard_view)
         
         self.perm_select = PermissionSelect(current_perms)
         self.add_item(self.perm_select)
@@ -149,15 +2049,14 @@ class ModRightsView(View):
             return await interaction.response.send_message("❌ Selecione pelo menos uma permissão.", ephemeral=True)
         
         await interaction.response.defer()
-        mod_manager = discloud.ModManager(discloud_client, self.app_id)
         
         try:
             perms_list = self.perm_select.values
             if self.mode == "add":
-                result = await mod_manager.add_mod(mod_id=self.mod_id, perms=perms_list)
+                result = await mods_cache.add(self.app_id, self.mod_id, perms_list)
                 title = "Novo Moderador Adicionado"
             else:
-                result = await mod_manager.edit_mod_perms(mod_id=self.mod_id, new_perms=perms_list)
+                result = await mods_cache.edit(self.app_id, self.mod_id, perms_list)
                 title = "Permissões Editadas"
             
             self.dashboard_view.last_notification = {
@@ -217,12 +2116,13 @@ class ModListSelect(Select):
                 view=ModRightsView(self.app_id, mod_id, "edit", self.dashboard_view, current_perms=current_perms)
             )
 
-class ModSelectionView(View):
+class ModSelectionView(TrackedView):
     def __init__(self, mods, mode, dashboard_view, app_id):
         super().__init__(timeout=300)
         self.dashboard_view = dashboard_view
         self.mode = mode
         self.app_id = app_id
+        view_registry.register(self, parent=dashboard_view)
         
         self.select_menu = ModListSelect(mods, mode, dashboard_view, app_id)
         self.add_item(self.select_menu)
@@ -246,13 +2146,12 @@ class ModSelectionView(View):
         
         await self.dashboard_view.set_processing(interaction, f"Removendo {len(selected_ids)} moderadores")
         
-        mod_manager = discloud.ModManager(discloud_client, self.app_id)
         results = []
         errors = 0
         
         for mod_id in selected_ids:
             try:
-                res = await mod_manager.delete_mod(mod_id)
+                res = await mods_cache.delete(self.app_id, mod_id)
                 results.append(f"✅ `{mod_id}`: Removido")
             except Exception as e:
                 errors += 1
@@ -272,6 +2171,417 @@ class ModSelectionView(View):
         
         await self.dashboard_view.update_dashboard(interaction, silent_update=True)
 
+# --- MATRIZ DE PERMISSÕES (MOD × APP) ---
+MODS_MATRIX_CONCURRENCY = int(os.getenv("MODS_MATRIX_CONCURRENCY", "4"))
+MODS_MATRIX_PAGE_SIZE = 8
+MODS_MATRIX_EMBED_BUDGET = 5800  # limite do Discord é 6000 caracteres por embed; sobra para o rodapé
+PERM_EMOJIS = {opt.value: str(opt.emoji) for opt in VALID_PERMISSIONS}
+PERM_LABELS = {opt.value: opt.label for opt in VALID_PERMISSIONS}
+
+class ModMatrix:
+    def __init__(self):
+        self.by_mod: Dict[str, Dict[str, List[str]]] = {}  # mod_id -> app_id -> permissões
+        self.app_count = 0
+        self.failed: List[str] = []
+        self.built_at = time.time()
+
+    def add(self, app_id: str, mods: List[AppMod]):
+        self.app_count += 1
+        for mod in mods:
+            self.by_mod.setdefault(str(mod.id), {})[app_id] = list(mod.perms or [])
+
+    def lookup(self, mod_id: str, perm: Optional[str] = None) -> Dict[str, List[str]]:
+        # Respondido só pelo índice, sem chamar a API
+        apps = self.by_mod.get(str(mod_id), {})
+        return {app_id: perms for app_id, perms in apps.items() if perm is None or perm in perms}
+
+    def mod_ids(self) -> List[str]:
+        return sorted(self.by_mod, key=lambda mod_id: (-len(self.by_mod[mod_id]), mod_id))
+
+async def build_mod_matrix(apps: List[AppSnapshot]) -> ModMatrix:
+    # As listas vêm do mods_cache (TTL curto), então abrir a matriz de novo logo em seguida não custa nada
+    limit = asyncio.Semaphore(MODS_MATRIX_CONCURRENCY)
+
+    async def load(app_id: str):
+        async with limit:
+            return await mods_cache.get(app_id)
+
+    matrix = ModMatrix()
+    results = await asyncio.gather(*(load(app.id) for app in apps), return_exceptions=True)
+    for app, result in zip(apps, results):
+        if isinstance(result, Exception):
+            print(f"Erro ao buscar mods de {app.id}: {result}")
+            matrix.failed.append(app.id)
+        else:
+            matrix.add(app.id, result)
+    return matrix
+
+def app_label(app_id: str) -> str:
+    info = APP_TABLE.get(app_id)
+    return info.name if info else app_id
+
+def format_perms(perms: List[str]) -> str:
+    return "".join(PERM_EMOJIS.get(p, "❔") for p in perms) or "—"
+
+class PermissionFilterSelect(Select):
+    def __init__(self, current: Optional[str]):
+        options = [discord.SelectOption(label="Qualquer permissão", value="*", emoji="🔎", default=current is None)]
+        options += [
+            discord.SelectOption(label=opt.label, value=opt.value, emoji=opt.emoji, default=opt.value == current)
+            for opt in VALID_PERMISSIONS
+        ]
+        super().__init__(placeholder="Filtrar por permissão...", options=options, row=1)
+
+    async def callback(self, interaction: Interaction):
+        self.view.perm = None if self.values[0] == "*" else self.values[0]
+        self.view.page = 0
+        await self.view.refresh(interaction)
+
+class ModLookupSelect(discord.ui.UserSelect):
+    def __init__(self):
+        super().__init__(placeholder="Buscar usuário (quais apps ele acessa?)", row=0)
+
+    async def callback(self, interaction: Interaction):
+        self.view.user = self.values[0]
+        await self.view.refresh(interaction)
+
+class ModMatrixView(TrackedView):
+    def __init__(self, matrix: ModMatrix, user: Optional[discord.abc.User] = None, perm: Optional[str] = None):
+        super().__init__(timeout=600)
+        self.matrix = matrix
+        self.user = user
+        self.perm = perm
+        self.page = 0
+        self.rebuild()
+
+    @property
+    def rows(self) -> List[str]:
+        mod_ids = self.matrix.mod_ids()
+        if self.perm:
+            mod_ids = [mod_id for mod_id in mod_ids if self.matrix.lookup(mod_id, self.perm)]
+        return mod_ids
+
+    def matrix_title(self) -> str:
+        return f"{E_MODS} Matriz de Permissões"
+
+    def matrix_description(self, rows: List[str]) -> str:
+        perm_txt = f" com **{PERM_LABELS[self.perm]}**" if self.perm else ""
+        return f"`{len(rows)}` moderadores{perm_txt} em `{self.matrix.app_count}` apps.\n{self.legend()}"
+
+    def mod_field(self, mod_id: str) -> tuple:
+        apps = self.matrix.lookup(mod_id, self.perm)
+        lines = [f"• **{app_label(app_id)}** → {format_perms(perms)}" for app_id, perms in apps.items()]
+        value = f"<@{mod_id}>\n" + "\n".join(lines)
+        if len(value) > 1024:
+            value = value[:1000].rsplit("\n", 1)[0] + "\n*…e mais apps*"
+        return f"👤 {mod_id} • {len(apps)} apps", value
+
+    def layout(self) -> List[List[tuple]]:
+        # Páginas fechadas por tamanho: até MODS_MATRIX_PAGE_SIZE campos sem passar do limite do embed
+        rows = self.rows
+        base = len(self.matrix_title()) + len(self.matrix_description(rows))
+        pages, current, used = [], [], base
+        for mod_id in rows:
+            name, value = self.mod_field(mod_id)
+            size = len(name) + len(value)
+            if current and (len(current) >= MODS_MATRIX_PAGE_SIZE or used + size > MODS_MATRIX_EMBED_BUDGET):
+                pages.append(current)
+                current, used = [], base
+            current.append((name, value))
+            used += size
+        if current:
+            pages.append(current)
+        return pages
+
+    @property
+    def pages(self) -> int:
+        return max(1, len(self.layout()))
+
+    def rebuild(self):
+        self.clear_items()
+        self.add_item(ModLookupSelect())
+        self.add_item(PermissionFilterSelect(self.perm))
+        for label, emoji, step in (("Anterior", "⬅️", -1), ("Próxima", "➡️", 1)):
+            btn = Button(label=label, emoji=emoji, style=ButtonStyle.secondary, row=2,
+                         disabled=self.user is not None or not 0 <= self.page + step < self.pages)
+            btn.callback = self.pager(step)
+            self.add_item(btn)
+        if self.user is not None:
+            btn_back = Button(label="Voltar à matriz", emoji="🧮", style=ButtonStyle.primary, row=2)
+            btn_back.callback = self.back_to_matrix
+            self.add_item(btn_back)
+
+    def pager(self, step: int):
+        async def cb(interaction: Interaction):
+            self.page = min(max(0, self.page + step), self.pages - 1)
+            await self.refresh(interaction)
+        return cb
+
+    async def back_to_matrix(self, interaction: Interaction):
+        self.user = None
+        await self.refresh(interaction)
+
+    async def refresh(self, interaction: Interaction):
+        self.rebuild()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    def build_embed(self) -> discord.Embed:
+        return self.build_lookup_embed() if self.user is not None else self.build_matrix_embed()
+
+    def legend(self) -> str:
+        return " • ".join(f"{PERM_EMOJIS[opt.value]} {opt.label}" for opt in VALID_PERMISSIONS)
+
+    def footer(self, embed: discord.Embed, extra: str = ""):
+        failed = f" • {len(self.matrix.failed)} apps sem resposta" if self.matrix.failed else ""
+        embed.set_footer(text=f"Discloud Manager • Matriz de mods{extra}{failed}")
+        embed.timestamp = datetime.fromtimestamp(self.matrix.built_at)
+
+    def build_matrix_embed(self) -> discord.Embed:
+        rows = self.rows
+        pages = self.layout()
+        self.page = min(self.page, max(0, len(pages) - 1))
+        embed = discord.Embed(title=self.matrix_title(), color=C_PURPLE, description=self.matrix_description(rows))
+        for name, value in (pages[self.page] if pages else []):
+            embed.add_field(name=name, value=value, inline=False)
+        if not rows:
+            embed.add_field(name="Vazio", value="Nenhum moderador encontrado com esse filtro.", inline=False)
+        self.footer(embed, f" • Página {self.page + 1}/{max(1, len(pages))}")
+        return embed
+
+    def build_lookup_embed(self) -> discord.Embed:
+        apps = self.matrix.lookup(self.user.id, self.perm)
+        action = f"pode **{PERM_LABELS[self.perm]}**" if self.perm else "tem acesso"
+        embed = discord.Embed(title=f"🔎 Acessos de {self.user.display_name}", color=C_PURPLE)
+        if apps:
+            lines = [f"• **{app_label(app_id)}** (`{app_id}`) → {format_perms(perms)}" for app_id, perms in apps.items()]
+            embed.description = f"<@{self.user.id}> {action} em `{len(apps)}` apps:\n" + "\n".join(lines)
+            if len(embed.description) > 4000:
+                embed.description = embed.description[:3980].rsplit("\n", 1)[0] + "\n*…e mais apps*"
+        else:
+            embed.description = f"<@{self.user.id}> não {action} em nenhuma app."
+        embed.add_field(name="Legenda", value=self.legend(), inline=False)
+        self.footer(embed)
+        return embed
+
+# --- RIGHT-SIZING DE RAM (AMOSTRAGEM + APLICAÇÃO EM LOTE) ---
+RIGHTSIZE_SAMPLE_INTERVAL = int(os.getenv("RIGHTSIZE_SAMPLE_INTERVAL", "300"))  # 0 = desativado
+RIGHTSIZE_WINDOW_HOURS = float(os.getenv("RIGHTSIZE_WINDOW_HOURS", "24"))
+RIGHTSIZE_HEADROOM = float(os.getenv("RIGHTSIZE_HEADROOM", "0.25"))
+RIGHTSIZE_STEP = int(os.getenv("RIGHTSIZE_STEP", "32"))
+RIGHTSIZE_MIN_SAMPLES = int(os.getenv("RIGHTSIZE_MIN_SAMPLES", "12"))
+RIGHTSIZE_CONCURRENCY = int(os.getenv("RIGHTSIZE_CONCURRENCY", "2"))
+RIGHTSIZE_MIN_RAM = {"bot": 100, "site": 512}
+RIGHTSIZE_TABLE_ROWS = 25
+RIGHTSIZE_SAMPLES_FILE = os.getenv("RIGHTSIZE_SAMPLES_FILE", os.path.join(BACKUP_DIR, "ram_samples.json"))
+RAM_SAMPLES_KEY = ("ram_samples", "fleet")
+
+class RamSampler:
+    def __init__(self):
+        self.samples: Dict[str, deque] = {}  # app_id -> (horário, MB em uso)
+        self.allocated: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if RIGHTSIZE_SAMPLE_INTERVAL > 0 and self._task is None:
+            self.load()
+            self._task = asyncio.create_task(self._loop())
+
+    async def _loop(self):
+        await bot.wait_until_ready()
+        while not bot.is_closed():
+            for account in list(ACCOUNTS.values()):
+                try:
+                    self.record(await fetch_account_status(account))
+                except Exception as e:
+                    print(f"Erro ao amostrar RAM da conta {account.name}: {e}")
+            # Só o worker 0 amostra; os outros shards leem as amostras pelo coordenador
+            coordinator.put(RAM_SAMPLES_KEY, (self.samples, self.allocated), ttl=RIGHTSIZE_SAMPLE_INTERVAL * 3)
+            try:
+                self.save()
+            except Exception as e:
+                print(f"Erro ao salvar amostras de RAM: {e}")
+            await asyncio.sleep(RIGHTSIZE_SAMPLE_INTERVAL)
+
+    def window_size(self) -> int:
+        return int(RIGHTSIZE_WINDOW_HOURS * 3600 / max(RIGHTSIZE_SAMPLE_INTERVAL, 1)) + 1
+
+    def load(self):
+        # Reinícios (AUTORESTART) não zeram a janela: retoma as amostras ainda dentro dela
+        try:
+            with open(RIGHTSIZE_SAMPLES_FILE, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            return print(f"Erro ao ler amostras de RAM: {e}")
+        since = time.time() - RIGHTSIZE_WINDOW_HOURS * 3600
+        for app_id, points in data.get("samples", {}).items():
+            kept = [(ts, used) for ts, used in points if ts >= since]
+            if kept:
+                self.samples[app_id] = deque(kept, maxlen=self.window_size())
+        self.allocated.update(data.get("allocated", {}))
+
+    def save(self):
+        folder = os.path.dirname(RIGHTSIZE_SAMPLES_FILE)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = RIGHTSIZE_SAMPLES_FILE + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump({"samples": {app_id: list(points) for app_id, points in self.samples.items()}, "allocated": self.allocated}, fh)
+        os.replace(tmp_path, RIGHTSIZE_SAMPLES_FILE)
+
+    async def sync_from_coordinator(self):
+        if SHARD_WORKER == 0 or not coordinator.enabled:
+            return
+        shared = await coordinator.get(RAM_SAMPLES_KEY, RIGHTSIZE_SAMPLE_INTERVAL * 3)
+        if shared is not None:
+            self.samples, self.allocated = shared
+
+    def record(self, statuses):
+        now = time.time()
+        size = self.window_size()
+        for status in statuses:
+            app_id = str(status.id)
+            allocated = parse_to_mb(status.memory.available)
+            if allocated:
+                self.allocated[app_id] = allocated
+            # App desligada usa 0MB: a amostra só distorceria o p95
+            if status.status == "Online":
+                self.samples.setdefault(app_id, deque(maxlen=size)).append((now, parse_to_mb(status.memory.using)))
+
+    def window(self, app_id: str, hours: float) -> List[float]:
+        since = time.time() - hours * 3600
+        return [used for ts, used in self.samples.get(str(app_id), ()) if ts >= since]
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, -(-len(ordered) * pct // 100) - 1)] if ordered else 0.0
+
+def round_up(value: float, step: int) -> int:
+    return int(-(-value // step) * step)
+
+def recommend_ram(app_id: str, hours: float) -> Optional[Dict]:
+    values = ram_sampler.window(app_id, hours)
+    current = ram_sampler.allocated.get(str(app_id))
+    if len(values) < RIGHTSIZE_MIN_SAMPLES or not current:
+        return None
+    p95, peak = percentile(values, 95), max(values)
+    info = APP_TABLE.get(app_id)
+    minimum = RIGHTSIZE_MIN_RAM["site" if info and str(info.type) == "1" else "bot"]
+    # Folga sobre o p95, mas nunca abaixo do pico observado (+10%)
+    target = max(p95 * (1 + RIGHTSIZE_HEADROOM), peak * 1.1, minimum)
+    recommended = round_up(target, RIGHTSIZE_STEP)
+    if abs(recommended - current) < RIGHTSIZE_STEP:
+        return None
+    return {"app_id": str(app_id), "name": info.name if info else str(app_id), "current": int(current),
+            "p95": p95, "peak": peak, "recommended": recommended, "samples": len(values)}
+
+ram_sampler = RamSampler()
+
+class RightSizeView(TrackedView):
+    def __init__(self, plan: List[Dict], hours: float, user_id: int):
+        super().__init__(timeout=600)
+        self.plan = plan
+        self.hours = hours
+        self.user_id = user_id
+        self.progress: Dict[str, str] = {}
+        self.running = False
+
+    async def interaction_check(self, interaction: Interaction) -> bool:
+        if interaction.user.id != self.user_id:
+            await interaction.response.send_message("❌ Só quem abriu o relatório pode aplicar as mudanças.", ephemeral=True)
+            return False
+        return await super().interaction_check(interaction)
+
+    def build_embed(self) -> discord.Embed:
+        saved = sum(row["current"] - row["recommended"] for row in self.plan)
+        embed = discord.Embed(title=f"{E_RAM} Right-sizing de RAM", color=C_GREEN if saved > 0 else C_GOLD)
+        header = f"{'App':<16} {'Atual':>6} {'p95':>5} {'Pico':>5} {'Nova':>5} {'Δ':>6}"
+        lines = [header, "-" * len(header)]
+        for row in self.plan[:RIGHTSIZE_TABLE_ROWS]:
+            delta = row["recommended"] - row["current"]
+            lines.append(
+                f"{row['name'][:16]:<16} {row['current']:>6} {row['p95']:>5.0f} {row['peak']:>5.0f} {row['recommended']:>5} {delta:>+6}"
+            )
+        extra = f"\n*…e mais {len(self.plan) - RIGHTSIZE_TABLE_ROWS} apps*" if len(self.plan) > RIGHTSIZE_TABLE_ROWS else ""
+        embed.description = (
+            f"Uso dos últimos `{self.hours:g}h` com `{RIGHTSIZE_HEADROOM:.0%}` de folga sobre o p95 (valores em MB).\n"
+            f"```\n" + "\n".join(lines) + f"\n```{extra}"
+        )
+        embed.add_field(name="💰 Resultado", value=f"**{saved:+}MB** {'liberados' if saved >= 0 else 'a mais'} no plano em `{len(self.plan)}` apps", inline=False)
+        if self.progress:
+            value = "\n".join(f"• **{row['name']}** → {self.progress.get(row['app_id'], '⏳ na fila')}" for row in self.plan)
+            embed.add_field(name="🔧 Aplicação", value=value[:1024], inline=False)
+        embed.set_footer(text="Discloud Manager • Right-sizing (cada app é reiniciada ao mudar a RAM)")
+        embed.timestamp = datetime.now()
+        return embed
+
+    @discord.ui.button(label="Aplicar", style=ButtonStyle.success, emoji="✅")
+    async def apply(self, interaction: Interaction, button: Button):
+        if self.running:
+            return await interaction.response.defer()
+        self.running = True
+        for item in self.children: item.disabled = True
+        self.progress = {row["app_id"]: "⏳ na fila" for row in self.plan}
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+        limit = asyncio.Semaphore(RIGHTSIZE_CONCURRENCY)
+        changed = asyncio.Event()
+
+        async def apply_one(row):
+            app_id = row["app_id"]
+            async with limit:
+                self.progress[app_id] = f"🔧 alterando para `{row['recommended']}MB`"
+                changed.set()
+                try:
+                    result, restarted = await change_app_ram(app_id, row["recommended"], by=interaction.user.display_name)
+                    if result.status != "ok":
+                        self.progress[app_id] = f"{E_ERROR} {result.message[:80]}"
+                        return
+                    if not restarted:
+                        self.progress[app_id] = f"{E_WARN} RAM alterada, mas a app ficou desligada"
+                        return
+                    self.progress[app_id] = "🔄 religando..."
+                    changed.set()
+                    converged, elapsed = await op_tracker.wait_for(app_id, "start")
+                    self.progress[app_id] = f"{E_SUCCESS} online em `{elapsed:.0f}s`" if converged else f"{E_WARN} não voltou em `{elapsed:.0f}s`"
+                except Exception as e:
+                    self.progress[app_id] = f"{E_ERROR} {str(e)[:80]}"
+                finally:
+                    changed.set()
+
+        async def refresher():
+            # Uma edição a cada poucos segundos no máximo, não uma por app
+            while True:
+                await changed.wait()
+                changed.clear()
+                try:
+                    await interaction.edit_original_response(embed=self.build_embed(), view=self)
+                except Exception as e:
+                    print(f"Erro ao atualizar right-sizing: {e}")
+                await asyncio.sleep(3)
+
+        updates = asyncio.create_task(refresher())
+        try:
+            await asyncio.gather(*(apply_one(row) for row in self.plan))
+        finally:
+            updates.cancel()
+            try:
+                await interaction.edit_original_response(embed=self.build_embed(), view=self)
+            except discord.HTTPException:
+                # Lotes grandes passam dos 15 min do token da interação: o resultado vai por DM
+                try:
+                    await interaction.user.send(embed=self.build_embed())
+                except discord.HTTPException as e:
+                    print(f"Erro ao entregar resultado do right-sizing: {e}")
+            view_registry.unregister(self)
+
+    @discord.ui.button(label="Cancelar", style=ButtonStyle.secondary, emoji="✖️")
+    async def cancel(self, interaction: Interaction, button: Button):
+        for item in self.children: item.disabled = True
+        await interaction.response.edit_message(view=self)
+        view_registry.unregister(self)
+
 # --- MODAIS GERAIS (TOOLS) ---
 
 class ChangeNameModal(Modal, title="Alterar Nome da App"):
@@ -286,14 +2596,15 @@ class ChangeNameModal(Modal, title="Alterar Nome da App"):
         await self.view_parent.set_processing(interaction, f"Atualizando Perfil...")
         
         try:
-            app = await discloud_client.app_info(self.app_id)
-            current_avatar = app.avatarURL
-            
-            success, msg = await update_app_profile(self.app_id, self.new_name.value, current_avatar)
+            account = account_for_app(self.app_id)
+
+            async def rename():
+                app = await account.call(lambda: account.client.app_info(self.app_id), "status", idempotent=True)
+                return await update_app_profile(self.app_id, self.new_name.value, app.avatarURL)
+            success, msg = await op_queue.submit(self.app_id, "profile", rename, key=("name", self.new_name.value), by=interaction.user.display_name)
             
             if success:
-                if self.app_id in self.view_parent.apps_info_map:
-                    self.view_parent.apps_info_map[self.app_id].name = self.new_name.value
+                APP_TABLE.update(self.app_id, name=self.new_name.value)
                 
                 # --- EMBED PADRONIZADO ---
                 embed = discord.Embed(
@@ -326,14 +2637,15 @@ class ChangeAvatarModal(Modal, title="Alterar Avatar da App"):
         await self.view_parent.set_processing(interaction, f"Atualizando Avatar...")
         
         try:
-            app = await discloud_client.app_info(self.app_id)
-            current_name = app.name
-            
-            success, msg = await update_app_profile(self.app_id, current_name, self.avatar_url.value)
+            account = account_for_app(self.app_id)
+
+            async def change_avatar():
+                app = await account.call(lambda: account.client.app_info(self.app_id), "status", idempotent=True)
+                return await update_app_profile(self.app_id, app.name, self.avatar_url.value)
+            success, msg = await op_queue.submit(self.app_id, "profile", change_avatar, key=("avatar", self.avatar_url.value), by=interaction.user.display_name)
             
             if success:
-                if self.app_id in self.view_parent.apps_info_map:
-                    self.view_parent.apps_info_map[self.app_id].avatarURL = self.avatar_url.value
+                APP_TABLE.update(self.app_id, avatarURL=self.avatar_url.value)
 
                 # --- EMBED PADRONIZADO ---
                 embed = discord.Embed(
@@ -390,15 +2702,11 @@ class RamModal(Modal, title="Alterar Memória RAM"):
         await self.view_parent.set_processing(interaction, f"Alterando RAM para {amount}MB")
         
         try:
-            result = await discloud_client.ram(app_id=self.app_id, new_ram=amount)
+            result, restarted = await change_app_ram(self.app_id, amount, by=interaction.user.display_name)
             start_msg = "A aplicação permaneceu desligada."
-            
-            if result.status == "ok":
-                try:
-                    await asyncio.sleep(2) 
-                    await discloud_client.start(self.app_id)
-                    start_msg = "Reiniciando aplicação automaticamente..."
-                except: pass
+            if restarted:
+                start_msg = "Reiniciando aplicação automaticamente..."
+                self.view_parent.track_operation(interaction, self.app_id, "start")
 
             is_success = result.status == "ok"
             api_msg = result.message.replace('ramMB', 'RAM')
@@ -416,7 +2724,7 @@ class RamModal(Modal, title="Alterar Memória RAM"):
                 embed.add_field(name="📝 Detalhes da API", value=f"```diff\n{clean_msg}\n```", inline=False)
                 
                 if "Reiniciando" in start_msg:
-                    embed.add_field(name="🚀 Ação Adicional", value="O sistema tentou reiniciar a aplicação automaticamente.", inline=False)
+                    embed.add_field(name="🚀 Ação Adicional", value="O sistema religou a aplicação e vai avisar quando ela estiver online.", inline=False)
 
                 embed.set_footer(text="Discloud Manager • Configuração atualizada", icon_url=interaction.client.user.display_avatar.url)
                 embed.timestamp = datetime.now()
@@ -457,40 +2765,42 @@ class DeleteAppModal(Modal, title="DELETAR APLICAÇÃO"):
         await self.view_parent.set_processing(interaction, f"Deletando App: {self.app_id}")
         
         try:
+            account = account_for_app(self.app_id)
             url = f"https://api.discloud.app/v2/app/{self.app_id}/delete"
-            headers = {
-                "api-token": DISCLOUD_TOKEN,
-                "Accept": "application/json"
-            }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.delete(url, headers=headers) as response:
+            async def delete():
+                async with account.session.delete(url, headers={"Accept": "application/json"}) as response:
                     try:
                         data = await response.json()
                     except:
                         data = {}
-                    
                     if response.status == 200 or data.get("status") == "ok":
-                        msg = data.get("message", "Aplicação deletada com sucesso.")
-                        
-                        embed = discord.Embed(
-                            title=f"{E_SUCCESS} Aplicação Deletada!",
-                            description=f"A aplicação **{self.app_id}** foi removida permanentemente.",
-                            color=C_GREEN # Verde conforme o check
-                        )
-                        embed.add_field(name="📝 Detalhes da API", value=f"```diff\n- {msg}\n```")
-                        embed.set_footer(text="Discloud Manager • App removido", icon_url=interaction.client.user.display_avatar.url)
-                        embed.timestamp = datetime.now()
-                        
-                        await interaction.followup.send(embed=embed, ephemeral=True)
-                        
-                        self.view_parent.selected_app_id = None
-                        self.view_parent.current_mode = "home"
-                        await self.view_parent.update_dashboard(interaction, silent_update=True)
-                        
-                    else:
-                        error_msg = data.get("message", await response.text())
-                        raise Exception(f"API Error {response.status}: {error_msg}")
+                        return data
+                    error_msg = data.get("message", await response.text())
+                    raise Exception(f"API Error {response.status}: {error_msg}")
+
+            data = await op_queue.submit(self.app_id, "delete", lambda: account.call(delete), key="delete", by=interaction.user.display_name)
+            msg = data.get("message", "Aplicação deletada com sucesso.")
+            
+            embed = discord.Embed(
+                title=f"{E_SUCCESS} Aplicação Deletada!",
+                description=f"A aplicação **{self.app_id}** foi removida permanentemente.",
+                color=C_GREEN # Verde conforme o check
+            )
+            embed.add_field(name="📝 Detalhes da API", value=f"```diff\n- {msg}\n```")
+            embed.set_footer(text="Discloud Manager • App removido", icon_url=interaction.client.user.display_avatar.url)
+            embed.timestamp = datetime.now()
+            
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            
+            mods_cache.invalidate(self.app_id)
+            coalescer.invalidate(self.app_id)
+            coalescer.invalidate(f"all:{account.name}")
+            APP_ACCOUNTS.pop(str(self.app_id), None)
+            APP_TABLE.remove(self.app_id)
+            self.view_parent.selected_app_id = None
+            self.view_parent.current_mode = "home"
+            await self.view_parent.update_dashboard(interaction, silent_update=True)
 
         except Exception as e:
             embed = discord.Embed(
@@ -505,7 +2815,7 @@ class DeleteAppModal(Modal, title="DELETAR APLICAÇÃO"):
 # --- UI COMPONENTES ---
 
 class AppSelect(Select):
-    def __init__(self, apps: List[ApplicationInfo], selected_id: str = None):
+    def __init__(self, apps: List[AppSnapshot], selected_id: str = None):
         options = []
         for app in apps[:25]: 
             emoji = E_ONLINE if app.online else E_OFFLINE
@@ -533,23 +2843,32 @@ class AppSelect(Select):
         self.view.current_mode = "status"
         await self.view.update_dashboard(interaction)
 
-class DashboardView(View):
-    def __init__(self, apps_info: List[ApplicationInfo]):
+class DashboardView(TrackedView):
+    def __init__(self, apps_info: List[AppSnapshot], accounts: List[DiscloudAccount]):
         super().__init__(timeout=600)
-        self.apps_info_map = {app.id: app for app in apps_info}
+        self.accounts = accounts
+        self.app_ids = [app.id for app in apps_info]  # os dados ficam na APP_TABLE
         self.selected_app_id = None
         self.current_mode = "home"
+        self.show_diagnostics = False
         self.last_notification: Optional[Dict] = None 
+        self.shown_mods: tuple = (None, [])  # (app_id, mods) da última aba de equipe renderizada
         
         if apps_info: 
             self.add_item(AppSelect(apps_info))
         self.create_nav_buttons()
 
+    @property
+    def apps(self) -> List[AppSnapshot]:
+        return [snap for snap in map(APP_TABLE.get, self.app_ids) if snap is not None]
+
+    def app_info(self, app_id: Optional[str]) -> Optional[AppSnapshot]:
+        return APP_TABLE.get(app_id) if app_id in self.app_ids else None
+
     @property
     def current_app_name(self):
-        if self.selected_app_id and self.selected_app_id in self.apps_info_map:
-            return self.apps_info_map[self.selected_app_id].name
-        return "Desconhecido"
+        info = self.app_info(self.selected_app_id)
+        return info.name if info else "Desconhecido"
 
     def create_nav_buttons(self):
         self.add_item(Button(label="Início", emoji=E_HOME, style=ButtonStyle.secondary, custom_id="mode_home", row=1))
@@ -581,12 +2900,13 @@ class DashboardView(View):
             description="Aguarde enquanto a Discloud processa sua solicitação...", 
             color=C_GOLD
         )
-        if not interaction.response.is_done():
-            await interaction.response.edit_message(embed=embed, view=self)
-        else:
-            try:
-                await interaction.edit_original_response(embed=embed, view=self)
-            except: pass
+        with profiler.phase("discord"):
+            if not interaction.response.is_done():
+                await interaction.response.edit_message(embed=embed, view=self)
+            else:
+                try:
+                    await interaction.edit_original_response(embed=embed, view=self)
+                except: pass
 
     async def show_error(self, interaction, error, action_name):
         for item in self.children: item.disabled = False
@@ -599,16 +2919,16 @@ class DashboardView(View):
         except: pass
 
     async def update_dashboard(self, interaction: Interaction, silent_update: bool = False):
+        view_registry.touch(self)
         try:
             try:
-                apps = await discloud_client.app_info("all")
-                apps = apps if isinstance(apps, list) else [apps] if apps else []
-                self.apps_info_map = {app.id: app for app in apps}
+                apps = await fetch_all_apps(self.accounts)
+                self.app_ids = [app.id for app in apps]
             except Exception as e:
                 print(f"Erro ao atualizar lista de apps: {e}")
-                apps = list(self.apps_info_map.values())
+            apps = self.apps
 
-            if self.selected_app_id and self.selected_app_id not in self.apps_info_map:
+            if self.selected_app_id and self.app_info(self.selected_app_id) is None:
                 self.selected_app_id = None
                 self.current_mode = "home"
                 if self.last_notification is None:
@@ -645,12 +2965,28 @@ class DashboardView(View):
                 self.add_item(btn_ref)
             elif self.current_mode == "control":
                 embed = discord.Embed(title=f"<:controle:1446905259191570464> Controle: {self.current_app_name}", color=C_GOLD, description="Gerencie a sua aplicação.")
+                timings = [
+                    f"• {label}: `{avg:.0f}s`" for op, label in OP_LABELS.items()
+                    if (avg := op_tracker.average(self.selected_app_id, op)) is not None
+                ]
+                if timings:
+                    embed.add_field(name="⏱️ Tempo médio até pronto", value="\n".join(timings), inline=False)
+                queued = op_queue.describe(self.selected_app_id)
+                avg_wait = op_queue.average_wait(self.selected_app_id)
+                if queued or avg_wait:
+                    value = "\n".join(queued) or "Nenhuma operação pendente."
+                    if avg_wait:
+                        value += f"\nEspera média na fila: `{avg_wait:.0f}s`"
+                    embed.add_field(name="📋 Fila de operações", value=value[:1024], inline=False)
                 self.add_control_buttons()
             elif self.current_mode == "logs":
                 embed = await self.build_logs_view()
-                btn_ref = Button(label="Atualizar Logs", emoji="🔄", style=ButtonStyle.primary, row=3)
-                btn_ref.callback = self.refresh_click
+                btn_ref = Button(label="Reanalisar" if self.show_diagnostics else "Atualizar Logs", emoji="🔄", style=ButtonStyle.primary, row=3)
+                btn_ref.callback = self.reanalyze_click if self.show_diagnostics else self.refresh_click
                 self.add_item(btn_ref)
+                btn_diag = Button(label="Terminal" if self.show_diagnostics else "Diagnóstico", emoji="<:terminal:1446262228121686088>" if self.show_diagnostics else "🩺", style=ButtonStyle.secondary, row=3)
+                btn_diag.callback = self.toggle_diagnostics
+                self.add_item(btn_diag)
             elif self.current_mode == "tools":
                 embed = await self.build_tools_view()
                 self.add_tools_buttons()
@@ -658,6 +2994,13 @@ class DashboardView(View):
                 embed = await self.build_mods_view()
                 await self.add_mods_buttons(interaction)
 
+            degraded = [b.describe() for acc in self.accounts for b in acc.degraded_breakers()]
+            if degraded:
+                keys = [f"all:{acc.name}" for acc in self.accounts] + [acc.name for acc in self.accounts] + [self.selected_app_id]
+                since = coalescer.stale_since(keys)
+                note = f"\n📦 Dados em cache de <t:{int(since)}:R>." if since else ""
+                embed.add_field(name="🔌 API Discloud instável", value="\n".join(degraded) + note, inline=False)
+
             if self.last_notification:
                 embed.insert_field_at(0, 
                     name=self.last_notification['title'], 
@@ -667,18 +3010,19 @@ class DashboardView(View):
                 embed.color = self.last_notification.get('color', embed.color)
                 self.last_notification = None
 
-            if silent_update:
-                if interaction.message:
-                    await interaction.message.edit(embed=embed, view=self)
+            with profiler.phase("discord"):
+                if silent_update:
+                    if interaction.message:
+                        await interaction.message.edit(embed=embed, view=self)
+                    else:
+                        await interaction.edit_original_response(embed=embed, view=self)
+                elif interaction.response.is_done():
+                    try:
+                        await interaction.edit_original_response(embed=embed, view=self)
+                    except discord.NotFound:
+                        if interaction.message: await interaction.message.edit(embed=embed, view=self)
                 else:
-                    await interaction.edit_original_response(embed=embed, view=self)
-            elif interaction.response.is_done():
-                try:
-                    await interaction.edit_original_response(embed=embed, view=self)
-                except discord.NotFound:
-                    if interaction.message: await interaction.message.edit(embed=embed, view=self)
-            else:
-                await interaction.response.edit_message(embed=embed, view=self)
+                    await interaction.response.edit_message(embed=embed, view=self)
                 
         except Exception as e: 
             if not silent_update:
@@ -689,28 +3033,56 @@ class DashboardView(View):
     async def refresh_click(self, interaction: Interaction):
         await self.update_dashboard(interaction)
 
+    async def toggle_diagnostics(self, interaction: Interaction):
+        self.show_diagnostics = not self.show_diagnostics
+        if self.show_diagnostics and log_analyzer.peek(self.selected_app_id) is None:
+            await self.set_processing(interaction, "Analisando logs")
+        await self.update_dashboard(interaction)
+
+    async def reanalyze_click(self, interaction: Interaction):
+        log_analyzer.invalidate(self.selected_app_id)
+        await self.set_processing(interaction, "Analisando logs")
+        await self.update_dashboard(interaction)
+
     def clear_dynamic_buttons(self):
         pass 
     
     async def build_home_view(self, user_discord):
-        user = await discloud_client.user_info()
-        apps = list(self.apps_info_map.values())
+        # Plano e uso de RAM de todas as contas visíveis, buscados em paralelo
+        results = await asyncio.gather(*(fetch_user_info(acc) for acc in self.accounts), return_exceptions=True)
+        users = [(acc, u) for acc, u in zip(self.accounts, results) if not isinstance(u, Exception)]
+        if not users:
+            raise results[0] if results else Exception("Nenhuma conta Discloud liberada para você.")
+        apps = self.apps
         
         embed = discord.Embed(title=f"{E_PLAN} Olá, Disclouder!", color=C_PURPLE)
         embed.set_thumbnail(url=user_discord.display_avatar.url)
-        embed.add_field(name="🆔 Usuário", value=f"`{user.id}`", inline=True)
-        embed.add_field(name="💎 Plano", value=f"**{user.plan}**", inline=True)
-        expire_str = "Vitalício"
-        if hasattr(user.plan, 'expire_date') and user.plan.expire_date:
-            try:
-                ts = int(user.plan.expire_date.date.timestamp())
-                expire_str = f"<t:{ts}:f>"
-            except: expire_str = str(user.plan.expire_date)
-        embed.add_field(name="🗓️ Validade", value=expire_str, inline=True)
-        bar = create_emoji_bar(str(user.using_ram), str(user.total_ram))
-        embed.add_field(name=f"{E_RAM} RAM Global ({user.using_ram}MB / {user.total_ram}MB)", value=f"{bar}", inline=False)
+        if len(self.accounts) == 1:
+            user = users[0][1]
+            embed.add_field(name="🆔 Usuário", value=f"`{user.id}`", inline=True)
+            embed.add_field(name="💎 Plano", value=f"**{user.plan}**", inline=True)
+            expire_str = "Vitalício"
+            if hasattr(user.plan, 'expire_date') and user.plan.expire_date:
+                try:
+                    ts = int(user.plan.expire_date.date.timestamp())
+                    expire_str = f"<t:{ts}:f>"
+                except: expire_str = str(user.plan.expire_date)
+            embed.add_field(name="🗓️ Validade", value=expire_str, inline=True)
+        else:
+            account_lines = [f"• **{acc.name}** — {u.plan} (`{u.using_ram}MB / {u.total_ram}MB`)" for acc, u in users]
+            failed = [acc.name for acc, u in zip(self.accounts, results) if isinstance(u, Exception)]
+            account_lines += [f"• **{name}** — {E_WARN} indisponível" for name in failed]
+            embed.add_field(name="📒 Contas", value="\n".join(account_lines)[:1024], inline=False)
+        using_ram = sum(int(u.using_ram) for _, u in users)
+        total_ram = sum(int(u.total_ram) for _, u in users)
+        bar = create_emoji_bar(str(using_ram), str(total_ram))
+        embed.add_field(name=f"{E_RAM} RAM Global ({using_ram}MB / {total_ram}MB)", value=f"{bar}", inline=False)
         
-        app_list_lines = [f"• **{app.name}** (`{app.id}`)" for app in apps]
+        show_account = len(self.accounts) > 1
+        app_list_lines = [
+            f"• **{app.name}** (`{app.id}`)" + (f" · {APP_ACCOUNTS.get(str(app.id), '?')}" if show_account else "")
+            for app in apps
+        ]
         if not app_list_lines:
             embed.add_field(name="📂 Minhas aplicações", value="Nenhuma aplicação encontrada.", inline=False)
         else:
@@ -731,8 +3103,8 @@ class DashboardView(View):
         return embed
 
     async def build_status_view(self):
-        status = await discloud_client.app_status(target=self.selected_app_id)
-        info = self.apps_info_map.get(self.selected_app_id)
+        status = await fetch_app_status(self.selected_app_id)
+        info = self.app_info(self.selected_app_id)
         color = C_GREEN if status.status == "Online" else C_RED
         embed = discord.Embed(title=f"App: {self.current_app_name}", color=color)
         if info and hasattr(info, 'avatarURL') and info.avatarURL: embed.set_thumbnail(url=info.avatarURL)
@@ -777,6 +3149,9 @@ class DashboardView(View):
         embed.add_field(name="🔄 Auto Restart", value=restart_msg, inline=True)
         if info and info.ramKilled:
              embed.add_field(name=f"{E_WARN} Alerta Crítico", value="O bot foi reiniciado por falta de RAM.", inline=False)
+        active = alert_engine.active_alerts(self.selected_app_id)
+        if active:
+            embed.add_field(name="🚨 Alertas ativos", value="\n".join(active.values())[:1024], inline=False)
         embed.set_footer(text="Discloud Manager", icon_url=bot.user.display_avatar.url)
         return embed
 
@@ -785,11 +3160,21 @@ class DashboardView(View):
         embed.description = "Utilitários avançados para manutenção."
         embed.add_field(name="<:backup:1446905215050842254> Backup", value="Baixar código-fonte.", inline=True)
         embed.add_field(name="<:memoriaram:1445901548638048489> RAM", value="Alterar memória RAM.", inline=True)
-        embed.add_field(name="📦 Update", value="Use `/commit`.", inline=True)
+        embed.add_field(name="📦 Update", value="Use `/commit` (com `verificar` para rollback automático).", inline=True)
+        deploys = DEPLOY_HISTORY.get(self.selected_app_id)
+        if deploys:
+            lines = []
+            for record in reversed(deploys):
+                title, _ = DEPLOY_OUTCOMES[record["outcome"]]
+                took = " · ".join(f"{name.split(' ', 1)[-1]} {sec:.0f}s" for name, sec, _ in record["stages"] if sec is not None)
+                lines.append(f"<t:{int(record['timestamp'].timestamp())}:R> {title.split(' ', 1)[0]} `{record['filename']}` — {took}")
+            embed.add_field(name="📜 Últimos deploys verificados", value="\n".join(lines)[:1024], inline=False)
         return embed
 
     async def build_logs_view(self):
-        logs = await discloud_client.logs(target=self.selected_app_id)
+        if self.show_diagnostics:
+            return build_diagnostics_embed(self.current_app_name, await log_analyzer.get(self.selected_app_id))
+        logs = await fetch_app_logs(self.selected_app_id)
         content = logs.small[:1000]
         embed = discord.Embed(title=f"<:terminal:1446262228121686088> Terminal: {self.current_app_name}", color=C_DARK, description=f"```bash\n{content}\n```")
         if len(content) >= 1000: embed.description += "\n*(Logs cortados)*"
@@ -798,9 +3183,8 @@ class DashboardView(View):
         return embed
 
     async def build_mods_view(self):
-        mods = await discloud.ModManager(discloud_client, self.selected_app_id).get_mods()
-        mods = mods if isinstance(mods, list) else [mods] if mods else []
-        self._current_mods_cache = mods 
+        mods = await mods_cache.get(self.selected_app_id)
+        self.shown_mods = (self.selected_app_id, mods)
         embed = discord.Embed(title=f"{E_MODS} Equipe: {self.current_app_name}", color=C_PURPLE)
         if not mods: embed.description = "Nenhum moderador extra configurado."
         for mod in mods:
@@ -809,9 +3193,9 @@ class DashboardView(View):
         return embed
 
     def add_control_buttons(self):
-        self.make_btn("Iniciar", E_ONLINE, ButtonStyle.success, discloud_client.start)
-        self.make_btn("Reiniciar", "🔄", ButtonStyle.primary, discloud_client.restart)
-        self.make_btn("Parar", E_OFFLINE, ButtonStyle.danger, discloud_client.stop)
+        self.make_btn("Iniciar", E_ONLINE, ButtonStyle.success, "start")
+        self.make_btn("Reiniciar", "🔄", ButtonStyle.primary, "restart")
+        self.make_btn("Parar", E_OFFLINE, ButtonStyle.danger, "stop")
     
     def add_tools_buttons(self):
         # Backup 
@@ -819,7 +3203,8 @@ class DashboardView(View):
         async def bkp_cb(i):
             await self.set_processing(i, "Gerando Backup")
             try:
-                b = await discloud_client.backup(self.selected_app_id)
+                account = account_for_app(self.selected_app_id)
+                b = await account.call(lambda: account.client.backup(self.selected_app_id), "backup", idempotent=True)
                 url = b.url if not isinstance(b, list) else b[0].url
                 link_button = Button(label="Baixar Backup", style=ButtonStyle.link, url=url, emoji="<:backup:1446905215050842254>")
                 link_view = View()
@@ -860,6 +3245,13 @@ class DashboardView(View):
         btn_del.callback = del_cb
         self.add_item(btn_del)
 
+    def current_mods(self) -> List[AppMod]:
+        # Sem ida à API antes de responder (prazo de 3 s): cache válido ou a lista já mostrada no painel
+        mods = mods_cache.peek(self.selected_app_id)
+        if mods is None and self.shown_mods[0] == self.selected_app_id:
+            mods = self.shown_mods[1]
+        return mods or []
+
     async def add_mods_buttons(self, interaction):
         btn_add = Button(label="Adicionar", emoji="➕", style=ButtonStyle.success, row=3)
         async def add(i): await i.response.send_modal(AddModIdModal(self.selected_app_id, self))
@@ -868,34 +3260,69 @@ class DashboardView(View):
 
         btn_edit = Button(label="Editar", emoji="✏️", style=ButtonStyle.primary, row=3)
         async def edit(i):
-            if not getattr(self, '_current_mods_cache', []): return await i.response.send_message("❌ Sem mods.", ephemeral=True)
+            mods = self.current_mods()
+            if not mods: return await i.response.send_message("❌ Sem mods.", ephemeral=True)
             embed = discord.Embed(title="✏️ Editar Moderador", description="Selecione abaixo:", color=C_BLUE)
-            await i.response.edit_message(embed=embed, view=ModSelectionView(self._current_mods_cache, "edit", self, self.selected_app_id))
+            await i.response.edit_message(embed=embed, view=ModSelectionView(mods, "edit", self, self.selected_app_id))
         btn_edit.callback = edit
         self.add_item(btn_edit)
 
         btn_rem = Button(label="Remover", emoji="🗑️", style=ButtonStyle.danger, row=3)
         async def rem(i):
-            if not getattr(self, '_current_mods_cache', []): return await i.response.send_message("❌ Sem mods.", ephemeral=True)
+            mods = self.current_mods()
+            if not mods: return await i.response.send_message("❌ Sem mods.", ephemeral=True)
             embed = discord.Embed(title="🗑️ Remover Moderador", description="Selecione abaixo:", color=C_RED)
-            await i.response.edit_message(embed=embed, view=ModSelectionView(self._current_mods_cache, "remove", self, self.selected_app_id))
+            await i.response.edit_message(embed=embed, view=ModSelectionView(mods, "remove", self, self.selected_app_id))
         btn_rem.callback = rem
         self.add_item(btn_rem)
 
-    def make_btn(self, lbl, emj, style, func):
+    def track_operation(self, interaction: Interaction, app_id: str, op: str, previous_start: Optional[float] = None):
+        info = self.app_info(app_id)
+        app_name = info.name if info else app_id
+        async def on_done(converged: bool, elapsed: float):
+            if converged:
+                past_tense = {"start": "Iniciada", "stop": "Parada", "restart": "Reiniciada"}[op]
+                embed = discord.Embed(
+                    title=f"{E_SUCCESS} Aplicação {past_tense}!",
+                    description=f"**{app_name}** atingiu o estado solicitado em **{elapsed:.0f}s**.",
+                    color=C_GREEN
+                )
+            else:
+                embed = discord.Embed(
+                    title=f"{E_WARN} Operação sem confirmação",
+                    description=f"**{app_name}** não atingiu o estado esperado após {elapsed:.0f}s. Verifique os logs.",
+                    color=C_GOLD
+                )
+            embed.set_footer(text=f"Discloud Manager • {OP_LABELS[op]}", icon_url=interaction.client.user.display_avatar.url)
+            embed.timestamp = datetime.now()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            if self.selected_app_id == app_id and self.current_mode in ("status", "control"):
+                await self.update_dashboard(interaction, silent_update=True)
+        op_tracker.track(app_id, op, on_done, previous_start)
+
+    def make_btn(self, lbl, emj, style, action):
         btn = Button(label=lbl, emoji=emj, style=style, row=3)
         async def cb(i):
             await self.set_processing(i, lbl)
             try:
-                res = await func(self.selected_app_id)
+                app_id = self.selected_app_id
+                account = account_for_app(app_id)
+
+                async def send_action():
+                    previous_start = None
+                    if action == "restart":
+                        # Reinício só conta como concluído quando a data de início mudar
+                        try:
+                            previous_start = status_started_at(await fetch_app_status(app_id, fresh=True))
+                        except Exception:
+                            pass
+                    return await account.call(lambda: getattr(account.client, action)(app_id)), previous_start
+                res, previous_start = await op_queue.submit(app_id, action, send_action, key=action, by=i.user.display_name)
                 
                 # --- EMBED PADRONIZADO (Sucesso) ---
-                action_map = {"Iniciar": "Iniciada", "Parar": "Parada", "Reiniciar": "Reiniciada"}
-                past_tense = action_map.get(lbl, lbl + "do")
-                
                 embed = discord.Embed(
-                    title=f"{E_SUCCESS} Aplicação {past_tense}!", 
-                    description=f"O comando de **{lbl.lower()}** foi enviado com sucesso para a Discloud.",
+                    title=f"{E_LOADING} Comando Enviado: {lbl}", 
+                    description=f"O comando de **{lbl.lower()}** foi aceito pela Discloud.\nVocê será avisado quando a aplicação atingir o estado solicitado.",
                     color=C_GREEN
                 )
                 
@@ -908,6 +3335,8 @@ class DashboardView(View):
 
                 await i.followup.send(embed=embed, ephemeral=True)
                 
+                coalescer.invalidate(app_id)
+                self.track_operation(i, app_id, action, previous_start)
                 self.current_mode="status"
                 await self.update_dashboard(i, silent_update=True)
                 
@@ -925,13 +3354,151 @@ class DashboardView(View):
         btn.callback = cb
         self.add_item(btn)
 
+# --- MÉTRICAS DE INICIALIZAÇÃO E MEMÓRIA ---
+BOOT_TIMES: Dict[str, float] = {}  # fase -> segundos desde o início do processo
+
+def mark_boot(phase: str):
+    if phase not in BOOT_TIMES:
+        BOOT_TIMES[phase] = time.perf_counter() - BOOT_STARTED
+
+def read_proc_status() -> Dict[str, int]:
+    # VmRSS/VmHWM/RssAnon/RssFile em KB (Linux); vazio em outros sistemas
+    values = {}
+    try:
+        with open("/proc/self/status", "r") as fh:
+            for line in fh:
+                key, _, rest = line.partition(":")
+                if key in ("VmRSS", "VmHWM", "RssAnon", "RssFile"):
+                    values[key] = int(rest.split()[0])
+    except OSError:
+        pass
+    return values
+
+def memory_report() -> List[str]:
+    proc = read_proc_status()
+    lines = []
+    if proc:
+        lines.append(f"RSS: `{proc.get('VmRSS', 0) / 1024:.1f}MB` (pico `{proc.get('VmHWM', 0) / 1024:.1f}MB`)")
+        lines.append(f"↳ Anônima (heap): `{proc.get('RssAnon', 0) / 1024:.1f}MB` • Arquivos/libs: `{proc.get('RssFile', 0) / 1024:.1f}MB`")
+    lines.append(f"Blocos Python alocados: `{sys.getallocatedblocks():,}` • Módulos: `{len(sys.modules)}`")
+    lines.append(f"Cache Discord: `{len(bot.guilds)}` servidores • `{len(bot.users)}` usuários • `{len(bot.cached_messages)}` mensagens")
+    lines.append(
+        f"Cache Discloud: `{len(coalescer._recent)}` respostas • `{len(mods_cache._entries)}` listas de mods • "
+        f"`{len(APP_ACCOUNTS)}` apps mapeadas • `{len(alert_engine.states)}` estados de alerta"
+    )
+    views = view_registry.stats()
+    lines.append(
+        f"Painéis vivos: `{views['views']}` (+`{views['children']}` sub-painéis) • "
+        f"`~{views['bytes'] / 1024:.0f}KB` retidos • `{views['evicted']}` despejados"
+    )
+    lines.append(f"Snapshots de apps: `{len(APP_TABLE)}` na tabela • `~{snapshot_memory_per_1000():.0f}KB` por 1.000 apps")
+    return lines
+
+SHARD_METRICS_PUSH_INTERVAL = 30
+
+class ShardMetrics:
+    def __init__(self):
+        self.events: Dict[int, deque] = {}  # shard -> horários dos eventos recentes
+        self.totals: Dict[int, int] = {}
+        self.states: Dict[int, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, shard_id: int):
+        self.events.setdefault(shard_id, deque(maxlen=5000)).append(time.monotonic())
+        self.totals[shard_id] = self.totals.get(shard_id, 0) + 1
+
+    def per_minute(self, shard_id: int) -> int:
+        events = self.events.get(shard_id)
+        if not events:
+            return 0
+        while events and time.monotonic() - events[0] > 60:
+            events.popleft()
+        return len(events)
+
+    def snapshot(self) -> Dict[int, Dict]:
+        latencies = bot.latencies if isinstance(bot, commands.AutoShardedBot) else [(0, bot.latency)]
+        return {
+            shard_id: {
+                "latency_ms": round(latency * 1000) if math.isfinite(latency) else None,  # inf/NaN até o primeiro heartbeat
+                "events_min": self.per_minute(shard_id),
+                "events_total": self.totals.get(shard_id, 0),
+                "state": self.states.get(shard_id, "pronto" if bot.is_ready() else "conectando"),
+                "guilds": sum(1 for g in bot.guilds if (g.shard_id or 0) == shard_id),
+            }
+            for shard_id, latency in latencies
+        }
+
+    def start(self):
+        if coordinator.enabled and self._task is None:
+            self._task = asyncio.create_task(self._push_loop())
+
+    async def _push_loop(self):
+        while True:
+            try:
+                coordinator.send(("metrics", SHARD_WORKER, self.snapshot()))
+            except Exception as e:
+                print(f"Erro ao enviar métricas dos shards: {e}")
+            await asyncio.sleep(SHARD_METRICS_PUSH_INTERVAL)
+
+    async def fleet(self) -> Dict[int, tuple]:
+        # Todos os processos quando há coordenador; senão só este
+        if coordinator.enabled:
+            try:
+                stats = await coordinator.request(("stats",))
+                stats[SHARD_WORKER] = (time.time(), self.snapshot())
+                return stats
+            except Exception as e:
+                print(f"Erro ao ler métricas dos shards: {e}")
+        return {SHARD_WORKER: (time.time(), self.snapshot())}
+
+shard_metrics = ShardMetrics()
+
+def shard_of(guild: Optional[discord.Guild]) -> int:
+    return (guild.shard_id or 0) if guild else 0
+
+def boot_report() -> List[str]:
+    labels = {"import": "Import do módulo", "login": "Login (setup_hook)", "ready": "Primeiro READY"}
+    return [f"{labels[phase]}: `{BOOT_TIMES[phase]:.2f}s`" for phase in labels if phase in BOOT_TIMES]
+
 # --- COMANDOS ---
+@bot.event
+async def setup_hook():
+    mark_boot("login")
+
 @bot.event
 async def on_ready():
+    mark_boot("ready")
     print(f"✅ Painel Online: {bot.user}")
+    print("⏱️ Inicialização: " + " | ".join(boot_report()))
+    shard_metrics.start()
+    # Com vários processos, só o primeiro worker roda as tarefas de fundo (sem alertas/backups/amostras duplicados)
+    if SHARD_WORKER == 0:
+        alert_engine.start()
+        backup_scheduler.start()
+        ram_sampler.start()
     activity = discord.Game(name="Discloud Dashboard • Meu Manager!") 
     await bot.change_presence(status=discord.Status.online, activity=activity)
 
+@bot.listen("on_interaction")
+async def count_interaction(interaction: Interaction):
+    shard_metrics.record(shard_of(interaction.guild))
+
+@bot.listen("on_message")
+async def count_message(message: discord.Message):
+    shard_metrics.record(shard_of(message.guild))
+
+@bot.listen("on_shard_ready")
+async def shard_ready(shard_id: int):
+    shard_metrics.states[shard_id] = "pronto"
+
+@bot.listen("on_shard_resumed")
+async def shard_resumed(shard_id: int):
+    shard_metrics.states[shard_id] = "pronto"
+
+@bot.listen("on_shard_disconnect")
+async def shard_disconnect(shard_id: int):
+    shard_metrics.states[shard_id] = "desconectado"
+
 @bot.command(name="sync")
 async def sync(ctx):
     if not ctx.author.guild_permissions.administrator: return
@@ -941,25 +3508,119 @@ async def sync(ctx):
     await bot.tree.sync(guild=ctx.guild)
     await msg.edit(content="✅ Painel sincronizado!")
 
+@bot.command(name="boot")
+async def boot(ctx):
+    if not ctx.author.guild_permissions.administrator: return
+    embed = discord.Embed(title="⏱️ Inicialização & Memória", color=C_DARK)
+    embed.add_field(name="🚀 Fases", value="\n".join(boot_report()) or "Sem dados.", inline=False)
+    embed.add_field(name=f"{E_RAM} Memória", value="\n".join(memory_report()), inline=False)
+    embed.set_footer(text="Discloud Manager • Diagnóstico do processo")
+    embed.timestamp = datetime.now()
+    await ctx.send(embed=embed)
+
+@bot.command(name="shards")
+async def shards(ctx):
+    if not ctx.author.guild_permissions.administrator: return
+    embed = discord.Embed(title="🧩 Shards", color=C_DARK)
+    for worker, (ts, data) in sorted((await shard_metrics.fleet()).items()):
+        lines = [
+            f"**#{shard_id}** • `{m['latency_ms'] if m['latency_ms'] is not None else '?'}ms` • "
+            f"`{m['events_min']}` eventos/min (`{m['events_total']}` no total) • `{m['guilds']}` servidores • {m['state']}"
+            for shard_id, m in sorted(data.items())
+        ]
+        embed.add_field(name=f"Processo {worker} • atualizado <t:{int(ts)}:R>", value="\n".join(lines)[:1024] or "Sem shards.", inline=False)
+    embed.set_footer(text="Discloud Manager • Sharding")
+    embed.timestamp = datetime.now()
+    await ctx.send(embed=embed)
+
+@bot.command(name="lentas")
+async def lentas(ctx):
+    if not ctx.author.guild_permissions.administrator: return
+    if not profiler.enabled:
+        return await ctx.send("ℹ️ O perfil de interações está desligado. Defina `PROFILE_INTERACTIONS=1` no .env.")
+    embed = discord.Embed(title="🐢 Interações mais lentas", color=C_DARK)
+    lines = []
+    for trace in profiler.slowest():
+        phases = " • ".join(f"{PROFILE_PHASE_LABELS[k]} `{v:.2f}s`" for k, v in trace.breakdown.items())
+        saved = " 📝" if trace.profiled else ""
+        lines.append(f"**`{trace.total:.2f}s`** {trace.label} — {trace.user} <t:{int(trace.ts)}:R>{saved}\n↳ {phases}")
+    embed.description = "\n".join(lines)[:4000] if lines else "Nenhuma interação registrada ainda."
+    embed.add_field(name="Perfis", value=f"📝 = perfil amostrado gravado em `{PROFILE_FILE}` (acima de `{PROFILE_THRESHOLD_MS}ms`)", inline=False)
+    embed.set_footer(text="Discloud Manager • Perfil de interações")
+    embed.timestamp = datetime.now()
+    await ctx.send(embed=embed)
+
 @bot.tree.command(name="painel", description="Abre o painel de gerenciamento Discloud")
 async def painel(interaction: Interaction):
     await interaction.response.defer()
     try:
-        apps = await discloud_client.app_info("all")
-        apps = apps if isinstance(apps, list) else [apps] if apps else []
-        view = DashboardView(apps)
+        accounts = accounts_for(interaction)
+        if not accounts:
+            return await interaction.followup.send("❌ Nenhuma conta Discloud liberada para este servidor/cargo.")
+        apps = await fetch_all_apps(accounts)
+        view = DashboardView(apps, accounts)
         embed = await view.build_home_view(interaction.user)
-        await interaction.followup.send(embed=embed, view=view)
+        message = await interaction.followup.send(embed=embed, view=view, wait=True)
+        view_registry.register(view, interaction.user.id, message)
     except Exception as e: await interaction.followup.send(f"❌ Erro ao abrir painel: {e}")
 
+@bot.tree.command(name="moderadores", description="Matriz de permissões dos moderadores em todas as apps")
+@app_commands.describe(usuario="Mostra só os acessos deste usuário", permissao="Filtra por uma permissão")
+@app_commands.choices(permissao=[app_commands.Choice(name=opt.label, value=opt.value) for opt in VALID_PERMISSIONS])
+async def moderadores(interaction: Interaction, usuario: Optional[discord.User] = None, permissao: Optional[app_commands.Choice[str]] = None):
+    await interaction.response.defer(ephemeral=True)
+    try:
+        accounts = accounts_for(interaction)
+        if not accounts:
+            return await interaction.followup.send("❌ Nenhuma conta Discloud liberada para este servidor/cargo.", ephemeral=True)
+        matrix = await build_mod_matrix(await fetch_all_apps(accounts))
+        view = ModMatrixView(matrix, usuario, permissao.value if permissao else None)
+        message = await interaction.followup.send(embed=view.build_embed(), view=view, ephemeral=True, wait=True)
+        view_registry.register(view, interaction.user.id, message)
+    except Exception as e: await interaction.followup.send(f"❌ Erro ao montar a matriz: {e}", ephemeral=True)
+
+@bot.tree.command(name="ajustar_ram", description="Sugere a RAM ideal de cada app pelo uso real e aplica em lote")
+@app_commands.describe(janela_horas=f"Janela de uso analisada em horas (máximo e padrão: {RIGHTSIZE_WINDOW_HOURS:g})")
+async def ajustar_ram(interaction: Interaction, janela_horas: Optional[app_commands.Range[float, 1.0, max(1.0, RIGHTSIZE_WINDOW_HOURS)]] = None):
+    await interaction.response.defer(ephemeral=True)
+    if RIGHTSIZE_SAMPLE_INTERVAL <= 0:
+        return await interaction.followup.send("ℹ️ A amostragem de RAM está desligada (`RIGHTSIZE_SAMPLE_INTERVAL=0`).", ephemeral=True)
+    try:
+        accounts = accounts_for(interaction)
+        if not accounts:
+            return await interaction.followup.send("❌ Nenhuma conta Discloud liberada para este servidor/cargo.", ephemeral=True)
+        hours = min(janela_horas or RIGHTSIZE_WINDOW_HOURS, RIGHTSIZE_WINDOW_HOURS)
+        await ram_sampler.sync_from_coordinator()
+        apps = await fetch_all_apps(accounts)
+        plan = [rec for rec in (recommend_ram(app.id, hours) for app in apps) if rec]
+        plan.sort(key=lambda rec: rec["recommended"] - rec["current"])
+        if not plan:
+            sampled = sum(1 for app in apps if len(ram_sampler.window(app.id, hours)) >= RIGHTSIZE_MIN_SAMPLES)
+            return await interaction.followup.send(
+                f"✅ Nenhum ajuste sugerido. `{sampled}/{len(apps)}` apps já têm amostras suficientes "
+                f"(mínimo `{RIGHTSIZE_MIN_SAMPLES}`, uma a cada `{RIGHTSIZE_SAMPLE_INTERVAL}s`).", ephemeral=True)
+        view = RightSizeView(plan, hours, interaction.user.id)
+        message = await interaction.followup.send(embed=view.build_embed(), view=view, ephemeral=True, wait=True)
+        view_registry.register(view, interaction.user.id, message)
+    except Exception as e: await interaction.followup.send(f"❌ Erro ao calcular o right-sizing: {e}", ephemeral=True)
+
 @bot.tree.command(name="commit", description="Fazer Upload/Update do Bot (.zip)")
-@app_commands.describe(app_id="ID do App", file_attachment="Arquivo .zip")
-async def commit(interaction: Interaction, app_id: str, file_attachment: discord.Attachment):
+@app_commands.describe(
+    app_id="ID do App",
+    file_attachment="Arquivo .zip",
+    verificar="Faz backup, acompanha a saúde após o deploy e reverte se a app quebrar",
+    janela="Janela de verificação de saúde em segundos (padrão: DEPLOY_HEALTH_WINDOW)"
+)
+async def commit(interaction: Interaction, app_id: str, file_attachment: discord.Attachment, verificar: bool = False, janela: Optional[app_commands.Range[int, 10, 600]] = None):
     if not file_attachment.filename.endswith(".zip"):
         return await interaction.response.send_message("❌ **Erro de Formato:** O arquivo precisa terminar em `.zip`.", ephemeral=True)
 
     await interaction.response.defer()
 
+    account = await resolve_app_account(interaction, app_id)
+    if account is None:
+        return await interaction.followup.send(f"❌ A aplicação `{app_id}` não pertence a nenhuma conta liberada para você.")
+
     loading_embed = discord.Embed(
         title=f"📦 Preparando Commit",
         description=f"Iniciando o envio dos arquivos para a Discloud...",
@@ -971,12 +3632,28 @@ async def commit(interaction: Interaction, app_id: str, file_attachment: discord
     
     await interaction.followup.send(embed=loading_embed)
 
+    if verificar:
+        async def on_progress(pipeline):
+            try:
+                await interaction.edit_original_response(embed=build_deploy_embed(pipeline))
+            except Exception as e:
+                print(f"Erro ao atualizar progresso do deploy: {e}")
+        pipeline = DeployPipeline(account, app_id, file_attachment.filename, janela or DEPLOY_HEALTH_WINDOW, on_progress)
+        try:
+            fp = io.BytesIO(await file_attachment.read())
+            await op_queue.submit(app_id, "deploy", lambda: pipeline.run(fp), by=interaction.user.display_name)
+        except Exception as e:
+            pipeline.outcome = "failed"
+            pipeline.stages.append({"name": "🛑 Erro Interno", "seconds": None, "ok": False, "detail": str(e)})
+        return await on_progress(pipeline)
+
     try:
         file_bytes = io.BytesIO(await file_attachment.read())
         d_file = discloud.File(file_bytes)
         d_file.filename = file_attachment.filename
 
-        res = await discloud_client.commit(app_id, d_file)
+        res = await op_queue.submit(app_id, "commit", lambda: account.call(lambda: account.client.commit(app_id, d_file)), by=interaction.user.display_name)
+        coalescer.invalidate(app_id)
 
         if res.status == "ok":
             success_embed = discord.Embed(
@@ -1015,11 +3692,16 @@ async def commit(interaction: Interaction, app_id: str, file_attachment: discord
         await interaction.edit_original_response(embed=fail_embed)
 
 @bot.tree.command(name="upload", description="Subir uma NOVA aplicação para a Discloud (.zip)")
-@app_commands.describe(file_attachment="Arquivo .zip da aplicação")
-async def upload(interaction: Interaction, file_attachment: discord.Attachment):
+@app_commands.describe(file_attachment="Arquivo .zip da aplicação", conta="Conta Discloud de destino (padrão: a primeira liberada)")
+async def upload(interaction: Interaction, file_attachment: discord.Attachment, conta: Optional[str] = None):
     if not file_attachment.filename.endswith(".zip"):
         return await interaction.response.send_message("❌ **Erro de Formato:** O arquivo precisa terminar em `.zip`.", ephemeral=True)
 
+    allowed = accounts_for(interaction)
+    account = next((acc for acc in allowed if acc.name == conta), None) if conta else (allowed[0] if allowed else None)
+    if account is None:
+        return await interaction.response.send_message("❌ Conta Discloud inválida ou não liberada para você.", ephemeral=True)
+
     await interaction.response.defer()
 
     loading_embed = discord.Embed(
@@ -1037,7 +3719,8 @@ async def upload(interaction: Interaction, file_attachment: discord.Attachment):
         d_file = discloud.File(file_bytes)
         d_file.filename = file_attachment.filename
 
-        result = await discloud_client.upload_app(file=d_file)
+        result = await account.call(lambda: account.client.upload_app(file=d_file))
+        coalescer.invalidate(f"all:{account.name}")
 
         if result.status == "ok":
             success_embed = discord.Embed(
@@ -1076,5 +3759,145 @@ async def upload(interaction: Interaction, file_attachment: discord.Attachment):
         fail_embed.add_field(name="🛑 Log de Erro", value=f"```python\n{str(e)}\n```", inline=False)
         await interaction.edit_original_response(embed=fail_embed)
 
+@bot.tree.command(name="backups", description="Lista e baixa os backups agendados guardados pelo bot")
+@app_commands.describe(app_id="ID do App (vazio = resumo de todas)", snapshot="Número do snapshot para baixar (1 = mais recente)")
+async def backups(interaction: Interaction, app_id: Optional[str] = None, snapshot: Optional[app_commands.Range[int, 1, 100]] = None):
+    store = backup_scheduler.store
+    await interaction.response.defer(ephemeral=True)
+
+    if app_id is None:
+        allowed = {acc.name for acc in accounts_for(interaction)}
+        lines = [
+            f"• `{aid}` — {len(snaps)} snapshots, último <t:{int(snaps[-1]['ts'])}:R>"
+            for aid, snaps in store.index.items()
+            if snaps and APP_ACCOUNTS.get(aid, default_account().name) in allowed
+        ]
+        embed = discord.Embed(title="<:backup:1446905215050842254> Backups Agendados", color=C_BLUE)
+        embed.description = "\n".join(lines)[:4000] if lines else "Nenhum backup guardado ainda."
+        embed.add_field(name=f"{E_SSD} Disco", value=f"`{store.disk_usage() / 1024 / 1024:.1f}MB`", inline=True)
+        interval = f"a cada {BACKUP_INTERVAL_HOURS:g}h" if BACKUP_INTERVAL_HOURS > 0 else "desativado"
+        embed.add_field(name="🕒 Agendamento", value=interval, inline=True)
+        if backup_scheduler.last_run:
+            last = backup_scheduler.last_run
+            embed.add_field(name="📋 Última execução", value=f"<t:{int(last['ts'])}:R> • {last['saved']} novos, {last['deduped']} sem mudança, {last['errors']} erros", inline=False)
+        embed.set_footer(text="Discloud Manager • Backups")
+        return await interaction.followup.send(embed=embed, ephemeral=True)
+
+    if await resolve_app_account(interaction, app_id) is None:
+        return await interaction.followup.send(f"❌ A aplicação `{app_id}` não pertence a nenhuma conta liberada para você.", ephemeral=True)
+
+    snaps = store.snapshots(app_id)
+    if not snaps:
+        return await interaction.followup.send(f"❌ Nenhum backup guardado para `{app_id}`.", ephemeral=True)
+
+    if snapshot is None:
+        lines = [
+            f"**{n}.** <t:{int(snap['ts'])}:f> • `{snap['size'] / 1024 / 1024:.1f}MB` • `{snap['hash'][:8]}`"
+            for n, snap in enumerate(snaps, start=1)
+        ]
+        embed = discord.Embed(title=f"<:backup:1446905215050842254> Backups: {app_id}", description="\n".join(lines)[:4000], color=C_BLUE)
+        embed.set_footer(text="Use /backups app_id:<ID> snapshot:<número> para baixar.")
+        return await interaction.followup.send(embed=embed, ephemeral=True)
+
+    if snapshot > len(snaps):
+        return await interaction.followup.send(f"❌ Snapshot inválido. Existem {len(snaps)} snapshots.", ephemeral=True)
+    snap = snaps[snapshot - 1]
+    path = store.object_path(snap["hash"])
+    limit = interaction.guild.filesize_limit if interaction.guild else 25 * 1024 * 1024
+    if not os.path.exists(path):
+        return await interaction.followup.send("❌ O arquivo deste snapshot não está mais no disco.", ephemeral=True)
+    if snap["size"] > limit:
+        return await interaction.followup.send(f"❌ O snapshot tem `{snap['size'] / 1024 / 1024:.1f}MB`, acima do limite de anexos deste servidor.", ephemeral=True)
+    filename = f"{app_id}-{datetime.fromtimestamp(snap['ts']).strftime('%Y%m%d-%H%M')}.zip"
+    await interaction.followup.send(file=discord.File(path, filename=filename), ephemeral=True)
+
+@bot.tree.command(name="report", description="Exporta um relatório de RAM/CPU/rede de todas as apps (CSV ou JSON)")
+@app_commands.describe(formato="Formato do arquivo")
+async def report(interaction: Interaction, formato: Literal["csv", "json"] = "csv"):
+    await interaction.response.defer(ephemeral=True)
+    accounts = accounts_for(interaction)
+    if not accounts:
+        return await interaction.followup.send("❌ Nenhuma conta Discloud liberada para você.", ephemeral=True)
+    begin = time.monotonic()
+    spool = None
+    try:
+        spool, count = await write_report(accounts, formato)
+        if count == 0:
+            return await interaction.followup.send("❌ Não foi possível obter dados de nenhuma aplicação.", ephemeral=True)
+        filename = f"frota-{datetime.now().strftime('%Y%m%d-%H%M')}.{formato}"
+        embed = discord.Embed(title="📊 Relatório da Frota", color=C_BLUE, timestamp=datetime.now())
+        embed.description = f"**{count}** aplicações em **{len(accounts)}** conta(s), gerado em `{time.monotonic() - begin:.1f}s`."
+        embed.set_footer(text="Discloud Manager • Relatório")
+        await interaction.followup.send(embed=embed, file=discord.File(spool, filename=filename), ephemeral=True)
+    except Exception as e: await interaction.followup.send(f"❌ Erro ao gerar relatório: {e}", ephemeral=True)
+    finally:
+        if spool is not None:
+            spool.close()
+
+@upload.autocomplete("conta")
+async def conta_autocomplete(interaction: Interaction, current: str):
+    return [
+        app_commands.Choice(name=acc.name, value=acc.name)
+        for acc in accounts_for(interaction) if current.lower() in acc.name.lower()
+    ][:25]
+
+mark_boot("import")
+
+async def run_bot():
+    async with bot:
+        try:
+            await bot.start(DISCORD_TOKEN)
+        finally:
+            await close_sessions()
+
+async def recommended_shards() -> int:
+    async with aiohttp.ClientSession(headers={"Authorization": f"Bot {DISCORD_TOKEN}"}) as session:
+        async with session.get("https://discord.com/api/v10/gateway/bot") as resp:
+            resp.raise_for_status()
+            return int((await resp.json())["shards"])
+
+async def supervise_worker(index: int, shard_ids: List[int], shard_count: int, socket_path: str):
+    env = dict(os.environ, SHARD_COUNT=str(shard_count), SHARD_PROCESSES="1", SHARD_WORKER=str(index),
+               SHARD_IDS=",".join(map(str, shard_ids)), COORDINATOR_SOCKET=socket_path)
+    while True:
+        proc = await asyncio.create_subprocess_exec(sys.executable, os.path.abspath(__file__), env=env)
+        try:
+            code = await proc.wait()
+        except asyncio.CancelledError:
+            proc.terminate()
+            await proc.wait()
+            raise
+        if code == 0:
+            return
+        print(f"⚠️ Processo {index} (shards {shard_ids}) saiu com código {code}; reiniciando em 5s")
+        await asyncio.sleep(5)
+
+async def run_launcher():
+    # Um processo por grupo de shards; o lançador só coordena orçamento, cache e métricas
+    shard_count = await recommended_shards() if SHARD_COUNT in ("", "auto") else int(SHARD_COUNT)
+    shard_count = max(shard_count, SHARD_PROCESSES)
+    groups = [list(range(i, shard_count, SHARD_PROCESSES)) for i in range(SHARD_PROCESSES)]
+    server = ShardCoordinator(COORDINATOR_SOCKET or os.path.join(tempfile.gettempdir(), f"discloud-manager-{os.getpid()}.sock"))
+    await server.start()
+    print(f"🧩 {shard_count} shards em {SHARD_PROCESSES} processos: {groups}")
+    try:
+        await asyncio.gather(*(supervise_worker(i, ids, shard_count, server.path) for i, ids in enumerate(groups)))
+    finally:
+        await server.stop()
+
+def main():
+    if not DISCORD_TOKEN or not (DISCLOUD_TOKEN or DISCLOUD_ACCOUNTS):
+        print("❌ ERRO: Tokens não definidos no .env")
+        sys.exit(1)
+    load_accounts()
+    if not ACCOUNTS:
+        print("❌ ERRO: Nenhuma conta Discloud válida em DISCLOUD_TOKEN/DISCLOUD_ACCOUNTS")
+        sys.exit(1)
+    discord.utils.setup_logging()
+    try:
+        asyncio.run(run_launcher() if SHARD_PROCESSES > 1 else run_bot())
+    except KeyboardInterrupt:
+        pass
+
 if __name__ == "__main__":
-    bot.run(DISCORD_TOKEN)
\ No newline at end of file
+    main()
\ No newline at end of file